@@ -0,0 +1,202 @@
+from physics import *
+import levelFile
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    #(no resource module on windows, so no peak memory there)
+    resource = None
+
+#benchmarks for the physics engine. Every case is run in its own process
+#(so the peak memory is just that case's) and the results are written as
+#json so they can be compared between engine changes:
+#   python benchmark.py [--quick] [--output bench_output.txt]
+
+scriptPath = os.path.abspath(__file__)
+
+screenWidth = 1250
+screenHeight = 750
+dt = 1/30.0
+
+#a pratt truss with nodeCount nodes (two rows) fixed at both ends
+def buildTruss(environ, nodeCount):
+    rowLen = max(2, nodeCount / 2)
+    bottom = []
+    top = []
+    for i in xrange(rowLen):
+        isFixed = (i == 0 or i == rowLen - 1)
+        bottom.append(Node(Vector(i*0.5, 2), 10, environ, isFixed, True))
+        top.append(Node(Vector(i*0.5 + 0.25, 2.5), 10, environ, False, True))
+    for i in xrange(rowLen - 1):
+        BridgeBed(bottom[i], bottom[i+1], 0.05, environ)
+        BridgeBeam(top[i], top[i+1], 0.05, environ)
+    for i in xrange(rowLen):
+        BridgeBeam(bottom[i], top[i], 0.05, environ)
+        if(i + 1 < rowLen):
+            BridgeBeam(top[i], bottom[i+1], 0.05, environ)
+
+#a bowl of land beams with weightCount weights falling into it. The weights
+#start on a grid (so none of them overlap and get pushed out of the bowl)
+#and the bowl is made wide enough for all of them to fit in a few rows.
+#Returns the screen width (in pixels) that the whole bowl fits in.
+def buildPile(environ, weightCount):
+    #(a little more than the diameter of a weight, which is 30 pixels)
+    spacing = environ.getEnvironScalar(30) + 0.05
+    rows = 10
+    columns = max(20, (weightCount + rows - 1) / rows)
+    left = 6
+    right = left + spacing * (columns - 1)
+    corners = [(left - 2, 12), (left - 1, 1), (right + 1, 1), (right + 2, 12)]
+    nodes = [Node(Vector(x, y), 10, environ, True) for (x, y) in corners]
+    for i in xrange(len(nodes) - 1):
+        LandBeam(nodes[i], nodes[i+1], 0.05, environ)
+
+    for i in xrange(weightCount):
+        (row, column) = (i / columns, i % columns)
+        Weight(Vector(left + column*spacing, 2 + row*spacing), 10, environ)
+    return max(screenWidth, int((right + 4) * environ.screenConversion))
+
+#the terrain of a shipped level with a weight dropped every few steps
+#(like play mode)
+def buildLevel(environ, path):
+    (nodePoints, constraintIndexes, startNodes, highScore) = (
+        levelFile.getLevelInfo(path))
+    nodes = [Node(Vector(x, y), 10, environ, True, False)
+             for (x, y) in nodePoints]
+    for (node1Index, node2Index) in constraintIndexes:
+        LandBeam(nodes[node1Index], nodes[node2Index], 0.05, environ)
+
+#every case as (name, kind, size, steps)
+def getCases(quick):
+    cases = []
+    levelFolder = os.path.join(os.path.dirname(scriptPath), "levels")
+    for fileName in sorted(os.listdir(levelFolder)):
+        if(fileName.startswith(levelFile.levelPrefix)):
+            path = levelFolder + os.sep + fileName
+            cases.append((levelFile.getLevelName(path), "level", path, 300))
+
+    trussSizes = [10, 100, 1000] if quick else [10, 100, 1000, 5000, 20000]
+    for size in trussSizes:
+        cases.append(("truss %d" % size, "truss", size,
+                      max(3, min(300, 100000 / size))))
+
+    #the bowl without weights has nothing that can move, so it only times 
+    #the idle path (a step where everything is fixed or asleep)
+    cases.append(("idle", "weights", 0, 300))
+    weightCounts = [100, 1000] if quick else [100, 1000, 5000]
+    for count in weightCounts:
+        cases.append(("weights %d" % count, "weights", count,
+                      max(3, min(300, 20000 / count))))
+
+    return cases
+
+#build and run one case in this process and return its results
+def runCase(name, kind, size, steps):
+    broadphase = "grid" if kind == "weights" else "sweep"
+    environ = PhysEnvironment(5, 50, 0, screenHeight, broadphase)
+    width = screenWidth
+    if(kind == "truss"):
+        buildTruss(environ, size)
+        #the small trusses settle within the timed steps, and then only the
+        #sleeping path would be timed, so they are kept awake
+        environ.sleepSteps = steps + 1
+    elif(kind == "weights"):
+        width = buildPile(environ, size)
+    else:
+        buildLevel(environ, size)
+    environ.start()
+
+    profiler = environ.startProfiling(steps)
+    rand = random.Random(15112)
+    start = time.time()
+    for step in xrange(steps):
+        if(kind == "level" and step % 10 == 0):
+            x = rand.uniform(1, screenWidth / 50.0 - 1)
+            Weight(Vector(x, 14), 100, environ)
+        environ.update(dt, width, screenHeight)
+    seconds = time.time() - start
+
+    #a weight that left the screen was deleted, so the rest of the steps 
+    #would have timed a smaller pile than the case says
+    if(kind == "weights" and len(environ.weightIndexes) != size):
+        raise Exception("%s: %d of %d weights left in the bowl" % 
+                        (name, len(environ.weightIndexes), size))
+
+    #(steps where everything is asleep aren't recorded)
+    records = profiler.getRecords()
+    objectsCreated = sum([record["objectsCreated"] for record in records])
+    pairs = sum([record["pairs"] for record in records])
+
+    results = {"name": name,
+               "kind": kind,
+               "nodes": len(environ.otherIndexes),
+               "constraints": len(environ.constraintIndexes),
+               "weights": len(environ.weightIndexes),
+               "steps": steps,
+               #steps that weren't skipped for being idle
+               "simulatedSteps": len(records),
+               "seconds": seconds,
+               "stepsPerSecond": steps / seconds,
+               #time per step of each phase (in seconds)
+               "phases": profiler.getAverages(),
+               #(vectors, physics objects and constraints, see StepProfiler)
+               "objectsCreatedPerStep": objectsCreated / float(steps),
+               "pairsPerStep": pairs / float(steps)}
+    if(resource != None):
+        #kilobytes on linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        results["peakMemory"] = peak
+    return results
+
+#the git commit the engine is at (or None if it isn't in a git repo)
+def getCommit():
+    try:
+        with open(os.devnull, "w") as devnull:
+            output = subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                             stderr=devnull)
+        return output.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#run every case (each in a new process) and return the report
+def runBenchmarks(quick):
+    report = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "commit": getCommit(),
+              "cases": []}
+    for case in getCases(quick):
+        command = [sys.executable, scriptPath, "--case", json.dumps(case)]
+        output = subprocess.check_output(command)
+        results = json.loads(output)
+        print >> sys.stderr, "%-12s %10.1f steps/s" % (results["name"],
+                                                      results["stepsPerSecond"])
+        report["cases"].append(results)
+    return report
+
+if(__name__ == "__main__"):
+    parser = argparse.ArgumentParser(description="benchmark the physics")
+    parser.add_argument("--quick", action="store_true",
+                        help="skip the biggest cases")
+    parser.add_argument("--output", help="file to write the json to")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if(args.case != None):
+        #running one case for the parent process
+        print json.dumps(runCase(*json.loads(args.case)))
+    else:
+        contents = json.dumps(runBenchmarks(args.quick), indent=2,
+                              sort_keys=True)
+        if(args.output != None):
+            levelFile.writeFile(args.output, contents)
+        else:
+            print contents
@@ -0,0 +1,309 @@
+from array import array
+import json
+import os
+import struct
+
+#reading and writing level files (and bridge files). Kept separate from
+#pyBridge so levels can be loaded without Tkinter
+
+#the order of the lines in a level file
+nodeListLineIndex = 0
+constraintListLineIndex = 1
+startNodeListLineIndex = 2
+highScoreIndex = 3
+
+levelPrefix = "level_"
+levelExtension = ".txt"
+
+#the text files are what gets edited and shared, but parsing them is slow,
+#so each parsed level is also saved in a binary form in the cache folder 
+#next to it (and kept in memory). Both are thrown out when the text file's
+#modification time or size changes
+cacheFolder = "cache"
+compiledExtension = ".bin"
+#header: magic, version, text file mtime and size, node count, constraint 
+#count, start node count, length of the high score text
+compiledHeader = struct.Struct("<4sIdqIIII")
+compiledMagic = "PYBL"
+compiledVersion = 1
+
+#path -> ((mtime, size), level info) of the levels read so far
+levelCache = dict()
+
+#the catalog of a levels folder lists every level in it with its name, 
+#counts and high score so the pick screen doesn't have to read every file.
+#It is saved in the cache folder and only files that changed are re-read
+catalogName = "catalog.json"
+catalogVersion = 2
+#levels folder -> catalog loaded so far
+catalogs = dict()
+
+#also from notes, #reads from a file
+def readFile(filename, mode="rt"):
+    # rt = "read text"
+    with open(filename, mode) as fin:
+        return fin.read()
+
+#again, from notes, writes to a file
+def writeFile(filename, contents, mode="wt"):
+    # wt = "write text"
+    with open(filename, mode) as fout:
+        fout.write(contents)
+
+#takes a list in text form and convert it to a list of numbers
+#if there were sublists or tuples, the elements in those are just
+#added to the number list where the tuple or sub list was
+def textToList(text):
+    #remove all spaces
+    text = text.replace(" ", "")
+
+    #remove parens around tuples and brackets around list
+    text = text.replace("(", "")
+    text = text.replace(")", "")
+    text = text.replace("[", "")
+    text = text.replace("]", "")
+
+    #an empty list
+    if(text == ""):
+        return []
+
+    numList = text.split(",")
+
+    #convert the strings to numbers
+    for i in xrange(len(numList)):
+        if("." in numList[i]):
+            numList[i] = float(numList[i])
+        else:
+            numList[i] = int(numList[i])
+
+    return numList
+
+#takes a list of tuples in text form and converts it to a regular list
+#assumes it is a list of tuples
+def textToTupleList(text):
+    numList = textToList(text)
+
+    #pair off the nubmers again (since they were unpaired when converted
+    #to a number list)
+    finalList = []
+    for i in xrange(0, len(numList), 2):
+        finalList.append((numList[i], numList[i+1]))
+
+    return finalList
+
+#takes a path to a level file and returns a tuple of the node list,
+#constraint list, start node list, and high score. The result is shared 
+#between callers, so it shouldn't be changed
+def getLevelInfo(path):
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+    cached = levelCache.get(path)
+    if(cached != None and cached[0] == key):
+        return cached[1]
+
+    info = readCompiledLevel(path, key)
+    if(info == None):
+        info = parseLevel(path)
+        try:
+            writeCompiledLevel(path, key, info)
+        except (IOError, OSError):
+            #(the levels folder might not be writable)
+            pass
+
+    levelCache[path] = (key, info)
+    return info
+
+#read and parse the text of a level file (see getLevelInfo)
+def parseLevel(path):
+    text = readFile(path)
+    text = text.splitlines()
+
+    nodeList = textToTupleList(text[nodeListLineIndex])
+    constraintList = textToTupleList(text[constraintListLineIndex])
+    startNodeList = textToList(text[startNodeListLineIndex])
+    highScore = text[highScoreIndex]
+
+    return (nodeList, constraintList, startNodeList, highScore)
+
+#the path of the compiled copy of the level file at path
+def getCompiledPath(path):
+    (folder, fileName) = os.path.split(path)
+    name = fileName[:-len(levelExtension)] + compiledExtension
+    return os.path.join(folder, cacheFolder, name)
+
+#save the level info in binary form: the header followed by the node 
+#coordinates (doubles), constraint and start node indexes (ints) and the 
+#high score text. key is the (mtime, size) of the text file
+def writeCompiledLevel(path, key, info):
+    (nodeList, constraintList, startNodeList, highScore) = info
+    compiledPath = getCompiledPath(path)
+    folder = os.path.dirname(compiledPath)
+    if(not os.path.isdir(folder)):
+        os.makedirs(folder)
+
+    coords = array("d")
+    for (x, y) in nodeList:
+        coords.append(x)
+        coords.append(y)
+    indexes = array("i")
+    for (node1, node2) in constraintList:
+        indexes.append(node1)
+        indexes.append(node2)
+    startNodes = array("i", startNodeList)
+
+    #write to a temporary file first so a half written file is never read
+    header = compiledHeader.pack(compiledMagic, compiledVersion, key[0], 
+                                 key[1], len(nodeList), len(constraintList), 
+                                 len(startNodeList), len(highScore))
+    tempPath = compiledPath + ".tmp"
+    with open(tempPath, "wb") as fout:
+        fout.write(header)
+        coords.tofile(fout)
+        indexes.tofile(fout)
+        startNodes.tofile(fout)
+        fout.write(highScore)
+    if(os.path.exists(compiledPath)):
+        os.remove(compiledPath)
+    os.rename(tempPath, compiledPath)
+
+#load the compiled copy of a level file, or return None if there isn't one
+#or it was made from a different version of the text file
+def readCompiledLevel(path, key):
+    try:
+        with open(getCompiledPath(path), "rb") as fin:
+            header = fin.read(compiledHeader.size)
+            if(len(header) != compiledHeader.size):
+                return None
+            (magic, version, mtime, size, nodeCount, constraintCount, 
+             startCount, highScoreLen) = compiledHeader.unpack(header)
+            if(magic != compiledMagic or version != compiledVersion or
+               (mtime, size) != key):
+                return None
+
+            coords = array("d")
+            coords.fromfile(fin, 2*nodeCount)
+            indexes = array("i")
+            indexes.fromfile(fin, 2*constraintCount)
+            startNodes = array("i")
+            startNodes.fromfile(fin, startCount)
+            highScore = fin.read(highScoreLen)
+    except (IOError, OSError, EOFError, struct.error):
+        return None
+
+    nodeList = zip(coords[0::2], coords[1::2])
+    constraintList = zip(indexes[0::2], indexes[1::2])
+    return (nodeList, constraintList, startNodes.tolist(), highScore)
+
+#the catalog entry for the level file at path. key is its (mtime, size)
+def getCatalogEntry(path, key):
+    (nodeList, constraintList, startNodeList, highScore) = getLevelInfo(path)
+    return {"name": getLevelName(path),
+            "path": path,
+            "nodes": len(nodeList),
+            "constraints": len(constraintList),
+            "startNodes": len(startNodeList),
+            "highScore": int(highScore),
+            "mtime": key[0],
+            "size": key[1]}
+
+#the saved catalog of the levels folder (or an empty one)
+def loadCatalog(levelFolder):
+    if(levelFolder in catalogs):
+        return catalogs[levelFolder]
+
+    catalog = {"version": catalogVersion, "levels": {}}
+    path = os.path.join(levelFolder, cacheFolder, catalogName)
+    try:
+        saved = json.loads(readFile(path))
+        if(saved.get("version") == catalogVersion):
+            catalog = saved
+    except (IOError, OSError, ValueError):
+        pass
+
+    catalogs[levelFolder] = catalog
+    return catalog
+
+def saveCatalog(levelFolder, catalog):
+    folder = os.path.join(levelFolder, cacheFolder)
+    path = os.path.join(folder, catalogName)
+    try:
+        if(not os.path.isdir(folder)):
+            os.makedirs(folder)
+        writeFile(path + ".tmp", json.dumps(catalog))
+        if(os.path.exists(path)):
+            os.remove(path)
+        os.rename(path + ".tmp", path)
+    except (IOError, OSError):
+        pass
+
+#returns the catalog entries (see getCatalogEntry) of every level in the 
+#folder, sorted by file name. Every level file is stat'ed each time (a file
+#edited in place doesn't change the folder's mtime), but only the ones whose
+#(mtime, size) changed are read again
+def getCatalog(levelFolder):
+    catalog = loadCatalog(levelFolder)
+    levels = catalog["levels"]
+
+    found = dict()
+    for fileName in os.listdir(levelFolder):
+        path = os.path.join(levelFolder, fileName)
+        if(not (fileName.startswith(levelPrefix) and 
+                fileName.endswith(levelExtension)) or 
+           os.path.isdir(path)):
+            continue
+        stat = os.stat(path)
+        key = (stat.st_mtime, stat.st_size)
+        entry = levels.get(fileName)
+        if(entry == None or (entry["mtime"], entry["size"]) != key):
+            entry = getCatalogEntry(path, key)
+        found[fileName] = entry
+
+    #(only saved when a level was added, removed or changed)
+    if(found != levels):
+        catalog["levels"] = levels = found
+        saveCatalog(levelFolder, catalog)
+
+    return [levels[fileName] for fileName in sorted(levels)]
+
+#re-read the level file at path into its folder's catalog (after it was 
+#saved or changed)
+def updateCatalog(path):
+    levelFolder = os.path.dirname(path)
+    catalog = loadCatalog(levelFolder)
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+    catalog["levels"][os.path.basename(path)] = getCatalogEntry(path, key)
+    saveCatalog(levelFolder, catalog)
+
+#returns the level name of the level file at the given path
+def getLevelName(path):
+    fileName = os.path.basename(path)
+    return fileName[len(levelPrefix):-len(levelExtension)]
+
+#returns the path of the level file with the given name
+def getLevelPath(levelFolder, levelName):
+    return levelFolder + os.sep + levelPrefix + levelName + levelExtension
+
+#a bridge is described by three lists (saved one per line like a level):
+#   the (x, y) points of the bridge's own nodes
+#   (node1, node2) index pairs of the BridgeBeds
+#   (node1, node2) index pairs of the BridgeBeams
+#node indexes below the number of start nodes in the level refer to the
+#level's start nodes (in the order the level lists them), the rest refer
+#to the bridge's nodes (so index len(startNodes) is the first bridge node)
+def getBridgeInfo(path):
+    text = readFile(path)
+    text = text.splitlines()
+
+    nodeList = textToTupleList(text[0])
+    bedList = textToTupleList(text[1])
+    beamList = textToTupleList(text[2])
+
+    return (nodeList, bedList, beamList)
+
+#save a bridge description (see getBridgeInfo) to the given path
+def saveBridgeInfo(path, bridge):
+    (nodeList, bedList, beamList) = bridge
+    contents = (str(list(nodeList)) + "\n" + str(list(bedList)) + "\n" +
+                str(list(beamList)))
+    writeFile(path, contents)
@@ -1,4 +1,10 @@
 import math
+import time
+from array import array
+from collections import OrderedDict, deque
+
+#most precise clock there is for timing short things
+getClock = getattr(time, "perf_counter", time.time)
 
 def rgbString(red, green, blue):
         return "#%02x%02x%02x" % (red, green, blue)
@@ -96,6 +102,986 @@ class Vector(object):
     def getCosTheta(self, other):
         return (self * other)/(self.getMag() * other.getMag())
 
+#keeps the state of every particle in an environment in parallel arrays
+#(struct of arrays) instead of in separate Vector objects. Each PhysObject 
+#owns one slot and reads/writes its state through that slot
+class ParticleStore(object):
+    def __init__(self):
+        #current position (in meters)
+        self.x = array("d")
+        self.y = array("d")
+        #position on the last step (only valid if hasOld is set)
+        self.oldX = array("d")
+        self.oldY = array("d")
+        self.hasOld = array("b")
+        #force accumulators (reset after every step)
+        self.forceX = array("d")
+        self.forceY = array("d")
+        #1/mass, zero for massless particles
+        self.invMass = array("d")
+        self.isFixed = array("b")
+        #if the particle is part of a sleeping island
+        self.asleep = array("b")
+        self.fixedCount = 0
+        self.asleepCount = 0
+
+        #the object that owns each slot
+        self.owners = []
+
+    def __len__(self):
+        return len(self.owners)
+
+    #all of the per-particle arrays (for copying/removing whole slots)
+    def getArrays(self):
+        return (self.x, self.y, self.oldX, self.oldY, self.hasOld, 
+                self.forceX, self.forceY, self.invMass, self.isFixed, 
+                self.asleep)
+
+    #give the object a slot, initialized with the object's detached state
+    #returns the index of the slot
+    def attach(self, obj):
+        (x, y, oldX, oldY, hasOld, forceX, forceY) = obj.detachedState
+        mass = obj.mass
+
+        self.x.append(x)
+        self.y.append(y)
+        self.oldX.append(oldX)
+        self.oldY.append(oldY)
+        self.hasOld.append(hasOld)
+        self.forceX.append(forceX)
+        self.forceY.append(forceY)
+        self.invMass.append(1.0/mass if mass != 0 else 0.0)
+        self.isFixed.append(1 if obj.isFixed else 0)
+        self.asleep.append(0)
+        self.owners.append(obj)
+        if(obj.isFixed):
+            self.fixedCount += 1
+
+        obj.detachedState = None
+        obj.particleIndex = len(self.owners) - 1
+        return obj.particleIndex
+
+    #get the state of a slot in the form stored by detachedState
+    def getState(self, i):
+        return (self.x[i], self.y[i], self.oldX[i], self.oldY[i], 
+                self.hasOld[i], self.forceX[i], self.forceY[i])
+
+    #remove the object's slot by moving the last slot into its place. The 
+    #object keeps a copy of its state so it can be attached again later.
+    #returns the object that was moved (or None if no object was moved)
+    def detach(self, obj):
+        i = obj.particleIndex
+        obj.detachedState = self.getState(i)
+        obj.particleIndex = None
+        self.fixedCount -= self.isFixed[i]
+        self.asleepCount -= self.asleep[i]
+
+        last = len(self.owners) - 1
+        moved = None
+        if(i != last):
+            for values in self.getArrays():
+                values[i] = values[last]
+            moved = self.owners[last]
+            self.owners[i] = moved
+            moved.particleIndex = i
+
+        for values in self.getArrays():
+            values.pop()
+        self.owners.pop()
+
+        return moved
+
+    #mark every particle as awake
+    def wakeAll(self):
+        self.asleep = array("b", [0]) * len(self.owners)
+        self.asleepCount = 0
+
+    #true if every particle is either fixed or asleep
+    def isIdle(self):
+        return self.fixedCount + self.asleepCount == len(self.owners)
+
+#relaxes all of the constraints in an environment straight from the particle
+#store, one constraint after another. Each constraint moves both of its 
+#(free) nodes half of the way back to its rest length, based on: 
+#http://www.gotoandplay.it/_articles/2005/08/advCharPhysics.php
+class ConstraintSolver(object):
+    def __init__(self, environ):
+        self.environ = environ
+        #node 1 slots, node 2 slots and rest lengths of the constraints to 
+        #relax, in the order of the environment's constraintIndexes
+        self.slots1 = array("i")
+        self.slots2 = array("i")
+        self.restLens = array("d")
+        self.isDirty = True
+
+    #the arrays need to be rebuilt (constraints or particle slots changed)
+    def markDirty(self):
+        self.isDirty = True
+
+    #copy the node slots and rest lengths of every awake constraint into 
+    #flat arrays. They are kept in the same order as constraintIndexes 
+    #(each constraint sees the nodes already moved by the ones before it, 
+    #so changing the order would change how bridges hold up)
+    def buildArrays(self):
+        environ = self.environ
+        asleep = environ.particles.asleep
+        self.slots1 = array("i")
+        self.slots2 = array("i")
+        self.restLens = array("d")
+
+        for index in environ.constraintIndexes:
+            constraint = environ.objects[index]
+            i = constraint.nodes[0].particleIndex
+            j = constraint.nodes[1].particleIndex
+            #constraints of sleeping islands are left alone
+            if(asleep[i] or asleep[j]):
+                continue
+            self.slots1.append(i)
+            self.slots2.append(j)
+            self.restLens.append(constraint.restLen)
+
+        self.isDirty = False
+
+    #move the nodes of every constraint back towards its rest length
+    #(one relaxation pass). Returns the largest |lenRatio| seen in the pass
+    def resolve(self):
+        if(self.isDirty):
+            self.buildArrays()
+
+        particles = self.environ.particles
+        (x, y, isFixed) = (particles.x, particles.y, particles.isFixed)
+        (slots1, slots2, restLens) = (self.slots1, self.slots2, self.restLens)
+        sqrt = math.sqrt
+        maxRatio = 0
+
+        for k in xrange(len(slots1)):
+            (i, j) = (slots1[k], slots2[k])
+            #vector going from node 1 to node 2
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            curLen = sqrt(dx*dx + dy*dy)
+            if(curLen == 0): curLen = 0.01
+
+            #shift each node by half of the displacement (multiplied in the 
+            #same order as the vector math, so the results are the same)
+            ratio = (curLen - restLens[k]) / curLen
+            if(abs(ratio) > maxRatio): maxRatio = abs(ratio)
+            shiftX = dx * 0.5 * ratio
+            shiftY = dy * 0.5 * ratio
+            if(not isFixed[i]):
+                x[i] += shiftX
+                y[i] += shiftY
+            if(not isFixed[j]):
+                x[j] -= shiftX
+                y[j] -= shiftY
+
+        return maxRatio
+
+#finds the pairs of objects that might be colliding by sweeping over the x 
+#edges of every collidable object (sweep and prune). The edge list is kept 
+#between updates and re-sorted with an insertion pass, since objects only 
+#move a little each time the edges are nearly sorted already.
+class SweepAndPrune(object):
+    def __init__(self, environ):
+        self.environ = environ
+        #edges in the form [xval, obj, isLeft, isWeight], sorted by xval
+        self.edges = []
+        #(left edge, right edge) of each object, by id
+        self.objEdges = dict()
+        #objects that haven't been given edges yet
+        self.newObjects = []
+        #if edges of removed objects still need to be taken out of the list
+        self.hasRemoved = False
+        self.weightCount = 0
+
+    #start tracking the object's edges
+    def add(self, obj):
+        self.newObjects.append(obj)
+        if(isinstance(obj, Weight)):
+            self.weightCount += 1
+
+    #stop tracking the object's edges
+    def remove(self, obj):
+        if(isinstance(obj, Weight)):
+            self.weightCount -= 1
+
+        edges = self.objEdges.pop(id(obj), None)
+        if(edges == None):
+            self.newObjects.remove(obj)
+        else:
+            #mark the edges so they are dropped on the next update
+            (leftEdge, rightEdge) = edges
+            leftEdge[1] = rightEdge[1] = None
+            self.hasRemoved = True
+
+    #bring the edge list up to date with the objects' current positions
+    def updateEdges(self):
+        edges = self.edges
+        if(self.hasRemoved):
+            edges[:] = [edge for edge in edges if edge[1] != None]
+            self.hasRemoved = False
+
+        for (leftEdge, rightEdge) in self.objEdges.itervalues():
+            (leftEdge[0], rightEdge[0]) = leftEdge[1].getXBounds()
+
+        #insertion pass, cheap since the list is nearly sorted
+        for k in xrange(1, len(edges)):
+            edge = edges[k]
+            x = edge[0]
+            j = k - 1
+            if(edges[j][0] <= x):
+                continue
+            while(j >= 0 and edges[j][0] > x):
+                edges[j+1] = edges[j]
+                j -= 1
+            edges[j+1] = edge
+
+        if(len(self.newObjects) > 0):
+            for obj in self.newObjects:
+                (xLeft, xRight) = obj.getXBounds()
+                isWeight = isinstance(obj, Weight)
+                leftEdge = [xLeft, obj, True, isWeight]
+                rightEdge = [xRight, obj, False, isWeight]
+                self.objEdges[id(obj)] = (leftEdge, rightEdge)
+                edges.append(leftEdge)
+                edges.append(rightEdge)
+            self.newObjects = []
+            #new edges can be anywhere so do a full (stable) sort
+            edges.sort(key=lambda edge: edge[0])
+
+    #returns a list of (weight, obj) pairs that overlap on the x axis, in the 
+    #order they are found by the sweep
+    def getPairs(self):
+        #only weights collide with things, so no weights means no pairs
+        if(self.weightCount == 0):
+            return []
+        self.updateEdges()
+
+        pairs = []
+        #objects whose left edge has been passed but not their right edge
+        active = OrderedDict()
+        activeWeights = OrderedDict()
+        for (x, obj, isLeft, isWeight) in self.edges:
+            key = id(obj)
+            if(isLeft):
+                #a new weight could hit anything already in the list, but 
+                #anything else can only be hit by the weights in the list
+                if(isWeight):
+                    for other in active.itervalues():
+                        pairs.append((obj, other))
+                    activeWeights[key] = obj
+                elif(len(activeWeights) > 0):
+                    for weight in activeWeights.itervalues():
+                        pairs.append((weight, obj))
+                active[key] = obj
+            else:
+                del active[key]
+                if(isWeight):
+                    del activeWeights[key]
+
+        return pairs
+
+#finds the pairs of objects that might be colliding by putting the weights 
+#into a uniform grid (spatial hash) with cells as wide as the largest weight.
+#a weight can then only hit weights in the 3x3 block of cells around it and
+#constraints whose bounding box covers its cell. Unlike the sweep this also 
+#prunes on y, so piles of weights stay close to linear.
+class SpatialHash(object):
+    #the weights and constraints are read from the environment's index 
+    #lists (instead of kept in the order they were added), so the pairs come
+    #out in the same order after the environment is restored from a 
+    #snapshot, which puts the objects back in index list order. Otherwise a 
+    #replay after a rewind could fix the collisions in a different order.
+    def __init__(self, environ):
+        self.environ = environ
+        #radius of the largest weight (in meters)
+        self.maxRadius = 0
+
+    #start tracking the object
+    def add(self, obj):
+        if(isinstance(obj, Weight)):
+            r = self.environ.getEnvironScalar(obj.r)
+            self.maxRadius = max(self.maxRadius, r)
+
+    #stop tracking the object (nothing to do, see __init__)
+    def remove(self, obj):
+        pass
+
+    #returns a list of (weight, obj) pairs of objects that are close enough 
+    #to be colliding
+    def getPairs(self):
+        environ = self.environ
+        if(len(environ.weightIndexes) == 0):
+            return []
+        (x, y) = (environ.particles.x, environ.particles.y)
+        objects = environ.objects
+        cellSize = 2 * self.maxRadius
+
+        #put each weight in the cell that its center is in
+        cells = dict()
+        for index in environ.weightIndexes:
+            weight = objects[index]
+            i = weight.particleIndex
+            cell = (int(math.floor(x[i] / cellSize)), 
+                    int(math.floor(y[i] / cellSize)))
+            if(cell in cells):
+                cells[cell].append(weight)
+            else:
+                cells[cell] = [weight]
+
+        pairs = []
+        #weights can only hit weights in the same or a neighboring cell
+        #(compare each neighbor cell once by only looking "forward")
+        neighbors = [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]
+        for ((cellX, cellY), cellWeights) in cells.iteritems():
+            for (dx, dy) in neighbors:
+                if(dx == 0 and dy == 0):
+                    for a in xrange(len(cellWeights)):
+                        for b in xrange(a):
+                            pairs.append((cellWeights[a], cellWeights[b]))
+                else:
+                    others = cells.get((cellX + dx, cellY + dy))
+                    if(others != None):
+                        for weight in cellWeights:
+                            for other in others:
+                                pairs.append((weight, other))
+
+        #constraints can hit the weights in any cell their bounding box 
+        #(grown by the collision distance) covers. When the box covers more
+        #cells than have weights in them (ex: a long beam and a few 
+        #weights) the cells with weights are checked instead, in the same 
+        #order the box would be
+        occupiedCells = None
+        for index in environ.constraintIndexes:
+            constraint = objects[index]
+            if(not constraint.isCollidable):
+                continue
+            i = constraint.nodes[0].particleIndex
+            j = constraint.nodes[1].particleIndex
+            margin = (self.maxRadius + 
+                      environ.getEnvironScalar(constraint.width/2))
+            minX = int(math.floor((min(x[i], x[j]) - margin) / cellSize))
+            maxX = int(math.floor((max(x[i], x[j]) + margin) / cellSize))
+            minY = int(math.floor((min(y[i], y[j]) - margin) / cellSize))
+            maxY = int(math.floor((max(y[i], y[j]) + margin) / cellSize))
+            if((maxX - minX + 1) * (maxY - minY + 1) > len(cells)):
+                if(occupiedCells == None):
+                    occupiedCells = sorted(cells)
+                for cell in occupiedCells:
+                    (cellX, cellY) = cell
+                    if(minX <= cellX <= maxX and minY <= cellY <= maxY):
+                        for weight in cells[cell]:
+                            pairs.append((weight, constraint))
+                continue
+
+            for cellX in xrange(minX, maxX + 1):
+                for cellY in xrange(minY, maxY + 1):
+                    cellWeights = cells.get((cellX, cellY))
+                    if(cellWeights != None):
+                        for weight in cellWeights:
+                            pairs.append((weight, constraint))
+
+        return pairs
+
+#a grid over the screen of where the nodes are drawn, for finding the node 
+#that was clicked without checking every node. Nodes are moved between 
+#cells as they are added, moved or deleted. The whole grid is rebuilt 
+#(when it is next used) after a step or when the view changes
+class NodeGrid(object):
+    #size of a cell (in pixels)
+    cellSize = 32
+
+    def __init__(self, environ):
+        self.environ = environ
+        #(column, row) -> {id of node: node}
+        self.cells = dict()
+        #id of node -> the cell it is in
+        self.cellOf = dict()
+        #radius of the largest node (in pixels)
+        self.maxRadius = 0
+        #the (origin x, origin y, screenConversion, renderAlpha) the cells
+        #were worked out for (see PhysEnvironment.getScreenCoords)
+        self.key = None
+        self.isDirty = True
+
+    def markDirty(self):
+        self.isDirty = True
+
+    #the view the screen positions depend on
+    def getKey(self):
+        environ = self.environ
+        (x0, y0) = environ.origin.getXY()
+        return (x0, y0, environ.screenConversion, environ.renderAlpha)
+
+    def getCell(self, x, y):
+        return (int(x // NodeGrid.cellSize), int(y // NodeGrid.cellSize))
+
+    #put the node in the cell it is drawn in
+    def place(self, node, x, y):
+        cell = self.getCell(x, y)
+        if(cell not in self.cells):
+            self.cells[cell] = dict()
+        self.cells[cell][id(node)] = node
+        self.cellOf[id(node)] = cell
+
+    #start tracking the node
+    def add(self, node):
+        self.maxRadius = max(self.maxRadius, node.r)
+        if(not self.isDirty):
+            environ = self.environ
+            (x, y) = environ.getScreenXY(node.getDrawPosition())
+            self.place(node, x, y)
+
+    #stop tracking the node
+    def remove(self, node):
+        cell = self.cellOf.pop(id(node), None)
+        if(cell != None):
+            del self.cells[cell][id(node)]
+            if(len(self.cells[cell]) == 0):
+                del self.cells[cell]
+
+    #move the node to the cell it is drawn in now
+    def moved(self, node):
+        if(not self.isDirty):
+            self.remove(node)
+            self.add(node)
+
+    #put every node in its cell again
+    def rebuild(self):
+        environ = self.environ
+        (screenX, screenY) = environ.getScreenCoords()
+        self.cells = dict()
+        self.cellOf = dict()
+        for index in environ.otherIndexes:
+            node = environ.objects[index]
+            if(isinstance(node, Node)):
+                i = node.particleIndex
+                self.place(node, screenX[i], screenY[i])
+        self.key = self.getKey()
+        self.isDirty = False
+
+    #returns the node at the given screen coordinates (or None). If nodes
+    #overlap it is the one that comes first in the environment's 
+    #otherIndexes (the one a scan through them would find)
+    def getClicked(self, screenX, screenY):
+        if(self.isDirty or self.key != self.getKey()):
+            self.rebuild()
+
+        r = self.maxRadius
+        (col0, row0) = self.getCell(screenX - r, screenY - r)
+        (col1, row1) = self.getCell(screenX + r, screenY + r)
+        clicked = None
+        for col in xrange(col0, col1 + 1):
+            for row in xrange(row0, row1 + 1):
+                for node in self.cells.get((col, row), {}).itervalues():
+                    if((clicked == None or 
+                        node.indexListIndex < clicked.indexListIndex) and 
+                       node.isClicked(screenX, screenY)):
+                        clicked = node
+        return clicked
+
+#keeps track of which nodes are connected to each other by constraints 
+#(union-find). Each set keeps a list of its nodes and the range of x values
+#they cover so questions like "does anything span the gap" don't need to 
+#search the whole structure. 
+#collidableOnly: only collidable constraints connect nodes
+#freeOnly: fixed nodes are left out (so they don't connect anything)
+class NodeSets(object):
+    def __init__(self, environ, collidableOnly, freeOnly=False):
+        self.environ = environ
+        self.collidableOnly = collidableOnly
+        self.freeOnly = freeOnly
+        #id of a node -> id of the root of its set
+        self.rootOf = dict()
+        #root id -> list of nodes in the set
+        self.members = dict()
+        #root id -> [minX, maxX] of the set's nodes
+        self.extents = dict()
+        #roots whose extents are out of date
+        self.movedRoots = set()
+        #if the sets need to be rebuilt from scratch (after a removal)
+        self.isDirty = False
+
+    #the sets need to be rebuilt (constraints were removed or changed nodes)
+    def markDirty(self):
+        self.isDirty = True
+
+    #the node moved, so the extents of its set might have changed
+    def nodeMoved(self, node):
+        root = self.rootOf.get(id(node))
+        if(root != None):
+            self.movedRoots.add(root)
+
+    #every node might have moved (ex: after a simulation step)
+    def allMoved(self):
+        self.movedRoots.update(self.members)
+
+    #add a node in a set of its own
+    def addNode(self, node):
+        key = id(node)
+        if(key not in self.rootOf):
+            x = self.environ.particles.x[node.particleIndex]
+            self.rootOf[key] = key
+            self.members[key] = [node]
+            self.extents[key] = [x, x]
+
+    #join the sets of the constraint's nodes (if it is included)
+    def addConstraint(self, constraint):
+        if(self.isDirty or 
+           (self.collidableOnly and not constraint.isCollidable)):
+            return
+        nodes = constraint.nodes
+        if(self.freeOnly):
+            nodes = [node for node in nodes if not node.isFixed]
+        for node in nodes:
+            self.addNode(node)
+        if(len(nodes) < 2):
+            return
+
+        (node1, node2) = nodes
+        root1 = self.rootOf[id(node1)]
+        root2 = self.rootOf[id(node2)]
+        if(root1 == root2):
+            return
+
+        #move the smaller set into the larger one
+        if(len(self.members[root1]) < len(self.members[root2])):
+            (root1, root2) = (root2, root1)
+        for node in self.members[root2]:
+            self.rootOf[id(node)] = root1
+        self.members[root1].extend(self.members.pop(root2))
+
+        extents = self.extents[root1]
+        (minX, maxX) = self.extents.pop(root2)
+        extents[0] = min(extents[0], minX)
+        extents[1] = max(extents[1], maxX)
+        if(root2 in self.movedRoots):
+            self.movedRoots.discard(root2)
+            self.movedRoots.add(root1)
+
+    #rebuild all of the sets from the environment's constraints
+    def rebuild(self):
+        self.rootOf = dict()
+        self.members = dict()
+        self.extents = dict()
+        self.movedRoots = set()
+        self.isDirty = False
+        for index in self.environ.constraintIndexes:
+            self.addConstraint(self.environ.objects[index])
+
+    #returns a list of [minX, maxX] for every set
+    def getExtents(self):
+        if(self.isDirty):
+            self.rebuild()
+
+        x = self.environ.particles.x
+        for root in self.movedRoots:
+            xVals = [x[node.particleIndex] for node in self.members[root]]
+            self.extents[root] = [min(xVals), max(xVals)]
+        self.movedRoots = set()
+
+        return self.extents.values()
+
+#splits the free nodes into islands (pieces connected by constraints) and
+#puts an island to sleep once it has stayed still for a while. Sleeping
+#particles aren't integrated and their constraints aren't relaxed or checked
+#for breaks until the island is woken up again.
+class Islands(object):
+    def __init__(self, environ):
+        self.environ = environ
+        #fixed nodes don't move, so they don't connect islands
+        self.sets = NodeSets(environ, False, True)
+        #root -> number of steps in a row the island has been still
+        self.stillSteps = dict()
+        self.asleepRoots = set()
+
+    #the islands need to be rebuilt (constraints were removed or changed).
+    #Only the islands the given nodes were in (ex: the ends of a removed 
+    #constraint) could have split, so only they are woken up now, and the 
+    #next update rebuilds the islands (see rebuild)
+    def markDirty(self, nodes=()):
+        for node in nodes:
+            self.wake(node)
+        self.sets.markDirty()
+
+    #join the islands of the constraint's nodes
+    def addConstraint(self, constraint):
+        for node in constraint.nodes:
+            self.wake(node)
+        self.sets.addConstraint(constraint)
+
+    #wake up the island the node is in (if it is asleep)
+    #(while the sets are dirty the old islands are used, each of them holds 
+    #every node of the islands it will be split into)
+    def wake(self, node):
+        root = self.sets.rootOf.get(id(node))
+        if(root in self.asleepRoots):
+            self.setAsleep(root, False)
+
+    #put the island with the given root to sleep or wake it up
+    #(only woken while the sets are dirty, their members are out of date)
+    def setAsleep(self, root, isAsleep):
+        if(self.sets.isDirty and isAsleep):
+            return
+        particles = self.environ.particles
+        for node in self.sets.members[root]:
+            i = node.particleIndex
+            #(deleted since the island was made)
+            if(i == None):
+                continue
+            if(particles.asleep[i] != isAsleep):
+                particles.asleepCount += 1 if isAsleep else -1
+            particles.asleep[i] = 1 if isAsleep else 0
+            #sleeping islands are completely still
+            particles.oldX[i] = particles.x[i]
+            particles.oldY[i] = particles.y[i]
+            particles.hasOld[i] = 1
+
+        if(isAsleep):
+            self.asleepRoots.add(root)
+        else:
+            self.asleepRoots.discard(root)
+        self.stillSteps[root] = 0
+        #the solver only relaxes the constraints of awake islands
+        self.environ.solver.markDirty()
+
+    #rebuild the islands from the environment's constraints. An island is 
+    #still asleep if all of its nodes are (the islands that could have split 
+    #were woken when the sets were marked dirty), and it keeps the still 
+    #step count of the old island it was part of
+    def rebuild(self):
+        (oldRootOf, oldStillSteps) = (self.sets.rootOf, self.stillSteps)
+        self.sets.rebuild()
+        self.asleepRoots = set()
+        self.stillSteps = dict()
+        particles = self.environ.particles
+        asleep = particles.asleep
+
+        for (root, members) in self.sets.members.iteritems():
+            slots = [node.particleIndex for node in members]
+            asleepCount = len([i for i in slots if asleep[i]])
+            if(asleepCount == len(slots)):
+                self.asleepRoots.add(root)
+            elif(asleepCount > 0):
+                #(an island can't be half asleep)
+                for i in slots:
+                    asleep[i] = 0
+                particles.asleepCount -= asleepCount
+            oldRoot = oldRootOf.get(id(members[0]))
+            self.stillSteps[root] = oldStillSteps.get(oldRoot, 0)
+        self.environ.solver.markDirty()
+
+    #put back the sleep state saved in a snapshot: asleep[k] and 
+    #stillSteps[k] are for nodes[k] (nodes must already be in islands)
+    def restore(self, nodes, asleep, stillSteps):
+        if(self.sets.isDirty):
+            return
+
+        for k in xrange(len(nodes)):
+            root = self.sets.rootOf.get(id(nodes[k]))
+            if(root == None):
+                continue
+            if(asleep[k] and root not in self.asleepRoots):
+                self.setAsleep(root, True)
+            self.stillSteps[root] = stillSteps[k]
+
+    #check how much each awake island moved since the last step and put the 
+    #ones that have been still long enough to sleep
+    #(called after the constraints are relaxed but before integrating, so 
+    #the old positions are last step's relaxed positions)
+    def update(self):
+        if(self.sets.isDirty):
+            self.rebuild()
+
+        environ = self.environ
+        particles = environ.particles
+        (x, y, oldX, oldY) = (particles.x, particles.y, 
+                              particles.oldX, particles.oldY)
+        threshold2 = environ.sleepThreshold**2
+
+        for (root, members) in self.sets.members.iteritems():
+            if(root in self.asleepRoots):
+                continue
+
+            isStill = True
+            for node in members:
+                i = node.particleIndex
+                dx = x[i] - oldX[i]
+                dy = y[i] - oldY[i]
+                if(dx*dx + dy*dy > threshold2):
+                    isStill = False
+                    break
+
+            if(isStill):
+                self.stillSteps[root] = self.stillSteps.get(root, 0) + 1
+                if(self.stillSteps[root] >= environ.sleepSteps):
+                    self.setAsleep(root, True)
+            else:
+                self.stillSteps[root] = 0
+
+#number of vectors, physics objects and constraints made while counting
+#(the objects made over and over while stepping)
+createdCount = 0
+#the original constructors of the counted classes while counting is on 
+#(None while it is off)
+originalInits = None
+#how many profilers are using the count (it stays on while any are)
+countingUsers = 0
+
+#wraps a constructor so every object it makes is added to createdCount
+def getCountingInit(init):
+    def countingInit(self, *args, **kwargs):
+        global createdCount
+        createdCount += 1
+        init(self, *args, **kwargs)
+    return countingInit
+
+#start counting the objects made (see getCreatedCount). The counting 
+#constructors are only swapped in while something is profiling, so making 
+#objects doesn't cost anything extra the rest of the time
+def startCounting():
+    global originalInits, countingUsers
+    if(countingUsers == 0):
+        originalInits = dict()
+        for cls in [Vector, PhysObject, Constraint]:
+            originalInits[cls] = cls.__dict__["__init__"]
+            cls.__init__ = getCountingInit(originalInits[cls])
+    countingUsers += 1
+
+#stop counting (once every profiler that started counting has stopped)
+def stopCounting():
+    global originalInits, countingUsers
+    if(countingUsers == 0):
+        return
+    countingUsers -= 1
+    if(countingUsers == 0):
+        for cls in originalInits:
+            cls.__init__ = originalInits[cls]
+        originalInits = None
+
+def getCreatedCount():
+    return createdCount
+
+#records how long each phase of PhysEnvironment.update takes (plus object,
+#pair and created object counts) for the last maxSteps steps. Created 
+#objects only counts the vectors, physics objects and constraints made 
+#during the step (not every allocation, like lists and tuples). Only used 
+#while the environment is profiling (see PhysEnvironment.startProfiling)
+class StepProfiler(object):
+    def __init__(self, maxSteps=300):
+        #one dictionary per step, oldest first
+        self.records = deque(maxlen=maxSteps)
+        self.record = None
+        self.stepCount = 0
+
+    #start timing a step of environ
+    def startStep(self, environ):
+        self.record = {"step": self.stepCount,
+                       "phases": dict(),
+                       "objects": len(environ.objects),
+                       "weights": len(environ.weightIndexes),
+                       "constraints": len(environ.constraintIndexes),
+                       "pairs": 0}
+        self.stepCount += 1
+        self.startCount = getCreatedCount()
+        self.startTime = self.phaseStart = getClock()
+
+    #add the time since the last phase ended to the given phase
+    def endPhase(self, phase, pairCount=0):
+        now = getClock()
+        phases = self.record["phases"]
+        phases[phase] = phases.get(phase, 0) + now - self.phaseStart
+        self.record["pairs"] += pairCount
+        self.phaseStart = now
+
+    #finish the step and add it to the records
+    def endStep(self, environ):
+        record = self.record
+        record["time"] = getClock() - self.startTime
+        record["objectsCreated"] = getCreatedCount() - self.startCount
+        record["iterations"] = environ.lastIterations
+        self.records.append(record)
+        self.record = None
+
+    #the records of the steps still in the buffer (oldest first)
+    def getRecords(self):
+        return list(self.records)
+
+    #the average time (seconds) of each phase over the recorded steps
+    def getAverages(self):
+        totals = dict()
+        for record in self.records:
+            for phase in record["phases"]:
+                totals[phase] = totals.get(phase, 0) + record["phases"][phase]
+        for phase in totals:
+            totals[phase] /= len(self.records)
+        return totals
+
+    def clear(self):
+        self.records.clear()
+
+#the state of every object in a PhysEnvironment kept in flat arrays, so it 
+#can be saved and put back much faster than copying the whole environment
+#(see PhysEnvironment.getSnapshot). Nodes and weights are numbered together
+#(nodes first) and constraints refer to their nodes by those numbers
+class Snapshot(object):
+    #bits of flags for each node/weight
+    hasOldFlag = 1
+    isFixedFlag = 2
+    visibleFlag = 4
+    asleepFlag = 8
+
+    def __init__(self, environ):
+        objects = environ.objects
+        particles = environ.particles
+        islands = environ.islands
+        self.isSimulating = environ.isSimulating
+        self.hasStarted = environ.hasStarted
+        self.broadphaseMode = environ.broadphaseMode
+        self.stepCount = environ.stepCount
+
+        #colors and constraint classes are stored as indexes into these
+        self.colors = []
+        self.constraintTypes = []
+        colorIndexes = dict()
+        typeIndexes = dict()
+
+        #nodes and weights
+        nodes = ([objects[index] for index in environ.otherIndexes] + 
+                 [objects[index] for index in environ.weightIndexes])
+        self.nodeCount = len(environ.otherIndexes)
+        slots = [node.particleIndex for node in nodes]
+        for name in ["x", "y", "oldX", "oldY", "forceX", "forceY"]:
+            values = getattr(particles, name)
+            setattr(self, name, array("d", [values[i] for i in slots]))
+        self.mass = array("d", [node.mass for node in nodes])
+
+        #(so the islands and their sleep are up to date)
+        if(islands.sets.isDirty):
+            islands.rebuild()
+        self.flags = array("b")
+        self.stillSteps = array("i")
+        self.nodeColors = array("i")
+        snapshotIndexes = dict()
+        for k in xrange(len(nodes)):
+            node = nodes[k]
+            i = slots[k]
+            snapshotIndexes[id(node)] = k
+            flags = 0
+            if(particles.hasOld[i]): flags |= Snapshot.hasOldFlag
+            if(particles.isFixed[i]): flags |= Snapshot.isFixedFlag
+            if(getattr(node, "visible", True)): flags |= Snapshot.visibleFlag
+            root = islands.sets.rootOf.get(id(node))
+            if(particles.asleep[i]): flags |= Snapshot.asleepFlag
+            self.flags.append(flags)
+            self.stillSteps.append(islands.stillSteps.get(root, 0))
+            self.nodeColors.append(self.getIndex(node.color, self.colors, 
+                                                 colorIndexes))
+
+        #constraints
+        self.node1 = array("i")
+        self.node2 = array("i")
+        self.types = array("i")
+        self.restLens = array("d")
+        self.breakRatios = array("d")
+        self.constraintColors = array("i")
+        for index in environ.constraintIndexes:
+            constraint = objects[index]
+            self.node1.append(snapshotIndexes[id(constraint.nodes[0])])
+            self.node2.append(snapshotIndexes[id(constraint.nodes[1])])
+            self.types.append(self.getIndex(type(constraint), 
+                                            self.constraintTypes, typeIndexes))
+            self.restLens.append(constraint.restLen)
+            self.breakRatios.append(constraint.breakRatio)
+            self.constraintColors.append(self.getIndex(constraint.color, 
+                                                       self.colors, 
+                                                       colorIndexes))
+
+    #index of value in values (added to the end if it isn't there yet)
+    #indexes is a dictionary of value -> index to make finding it fast
+    def getIndex(self, value, values, indexes):
+        if(value not in indexes):
+            indexes[value] = len(values)
+            values.append(value)
+        return indexes[value]
+
+    #replace everything in environ with the objects in the snapshot
+    def restore(self, environ):
+        environ.resetObjects(self.broadphaseMode)
+        environ.isSimulating = self.isSimulating
+        environ.hasStarted = self.hasStarted
+        environ.stepCount = self.stepCount
+        particles = environ.particles
+        colors = self.colors
+
+        nodes = []
+        for k in xrange(len(self.x)):
+            position = Vector(self.x[k], self.y[k])
+            flags = self.flags[k]
+            color = colors[self.nodeColors[k]]
+            if(k < self.nodeCount):
+                node = Node(position, self.mass[k], environ, 
+                            (flags & Snapshot.isFixedFlag) != 0,
+                            (flags & Snapshot.visibleFlag) != 0, color)
+            else:
+                node = Weight(position, self.mass[k], environ)
+                node.color = color
+
+            i = node.particleIndex
+            particles.oldX[i] = self.oldX[k]
+            particles.oldY[i] = self.oldY[k]
+            particles.hasOld[i] = 1 if (flags & Snapshot.hasOldFlag) else 0
+            particles.forceX[i] = self.forceX[k]
+            particles.forceY[i] = self.forceY[k]
+            nodes.append(node)
+
+        for c in xrange(len(self.node1)):
+            constraintType = self.constraintTypes[self.types[c]]
+            constraint = constraintType(nodes[self.node1[c]], 
+                                        nodes[self.node2[c]], 
+                                        self.breakRatios[c], environ)
+            constraint.restLen = self.restLens[c]
+            constraint.color = colors[self.constraintColors[c]]
+            constraint.updateInfo()
+
+        asleep = [(flags & Snapshot.asleepFlag) != 0 for flags in self.flags]
+        environ.islands.restore(nodes, asleep, self.stillSteps)
+        return nodes
+
+#snapshots of an environment taken every interval steps, with only the 
+#newest maxCheckpoints kept (see PhysEnvironment.startCheckpoints). 
+#Checkpoints are taken between steps, after the forces were used up
+class CheckpointBuffer(object):
+    def __init__(self, interval, maxCheckpoints):
+        self.interval = interval
+        #(step, snapshot) pairs, oldest first
+        self.checkpoints = deque(maxlen=maxCheckpoints)
+
+    #save a checkpoint of the environment as it is now
+    def add(self, environ):
+        self.checkpoints.append((environ.stepCount, environ.getSnapshot()))
+
+    #called after each step of the environment
+    def stepped(self, environ):
+        if(environ.stepCount % self.interval == 0):
+            self.add(environ)
+
+    #the steps there are checkpoints for (oldest first)
+    def getSteps(self):
+        return [step for (step, snapshot) in self.checkpoints]
+
+    #the newest (step, snapshot) at or before the given step
+    def getBefore(self, step):
+        for (checkpointStep, snapshot) in reversed(self.checkpoints):
+            if(checkpointStep <= step):
+                return (checkpointStep, snapshot)
+        raise Exception("no checkpoint at or before step %d" % step)
+
+    #forget the checkpoints after the given step
+    def dropAfter(self, step):
+        while(len(self.checkpoints) > 0 and self.checkpoints[-1][0] > step):
+            self.checkpoints.pop()
+
 #this class keeps track of all aspects of the physics environment
 #objects, converting units, updating objects, collisions, etc. 
 class PhysEnvironment(object):
@@ -103,7 +1089,8 @@ class PhysEnvironment(object):
     #gravity = gravity in m/s**2
     #screenConversion = pixels/meter
     #x0, y0 = origin in screen coordinates
-    def __init__(self, gravity, screenConversion, x0, y0):
+    #broadphase = how to find possible collisions, "sweep" or "grid"
+    def __init__(self, gravity, screenConversion, x0, y0, broadphase="sweep"):
         self.gravity = gravity
         self.screenConversion = screenConversion
 
@@ -113,14 +1100,147 @@ class PhysEnvironment(object):
         self.isSimulating = False
         #has the simulation been started once
         self.hasStarted = False 
-
+        #how far (0 to 1) to draw objects between their last position and 
+        #their current one
+        self.renderAlpha = 1.0
+
+        self.resetObjects(broadphase)
+        #an island sleeps once no node moves more than sleepThreshold 
+        #(meters) in a step for sleepSteps steps in a row
+        self.sleepThreshold = 0.0005
+        self.sleepSteps = 30
+
+        #the constraints and collisions are relaxed until the worst 
+        #|lenRatio| is under resolveTolerance and the deepest collision is 
+        #under collisionTolerance (meters), or resolveIterations passes ran
+        self.resolveIterations = 5
+        self.resolveTolerance = 0.0005
+        self.collisionTolerance = 0.001
+        #passes used by the last update
+        self.lastIterations = 0
+        #StepProfiler while profiling, None otherwise
+        self.profiler = None
+        #number of steps simulated so far
+        self.stepCount = 0
+        #CheckpointBuffer while keeping checkpoints, None otherwise
+        self.checkpoints = None
+        self.debug = False
+        #canvas items of deleted objects, removed from the canvas on the 
+        #next draw
+        self.deletedItems = []
+        #true once an item was added to the canvas (so the layers need to 
+        #be put back in order)
+        self.itemsAdded = False
+        #(screenX, screenY) arrays of every particle slot (see 
+        #getScreenCoords) and the (origin x, origin y, screenConversion, 
+        #renderAlpha) they were worked out for
+        self.screenCoords = None
+        self.screenCoordsKey = None
+
+    #remove every object (and everything kept about them) from the 
+    #environment, using the given broadphase from now on
+    def resetObjects(self, broadphase):
+        for obj in getattr(self, "objects", []):
+            self.removeItem(obj)
         self.constraintIndexes = []
         self.weightIndexes = []
         self.otherIndexes = []
         self.objects = []
+        #position, force, mass info for every PhysObject
+        self.particles = ParticleStore()
+        #relaxes the constraints each iteration
+        self.solver = ConstraintSolver(self)
+        #finds the objects that could be colliding
+        self.setBroadphase(broadphase)
+        #nodes connected by collidable constraints (for checking the span)
+        self.collidableSets = NodeSets(self, True)
+        #pieces of the structure that can be put to sleep
+        self.islands = Islands(self)
+        #where the nodes are on the screen (for clicking)
+        self.nodeGrid = NodeGrid(self)
+
+    #start saving a checkpoint of the environment every interval steps 
+    #(starting with the current state). Only the newest maxCheckpoints are 
+    #kept, so the memory used stays bounded
+    def startCheckpoints(self, interval=30, maxCheckpoints=20):
+        self.checkpoints = CheckpointBuffer(interval, maxCheckpoints)
+        self.checkpoints.add(self)
+        return self.checkpoints
+
+    def stopCheckpoints(self):
+        self.checkpoints = None
+
+    #go back to the newest checkpoint at or before the given step and 
+    #return the step it was taken at. Checkpoints after it are dropped (they
+    #are taken again as the simulation runs forward)
+    def restoreCheckpoint(self, step):
+        (checkpointStep, snapshot) = self.checkpoints.getBefore(step)
+        self.checkpoints.dropAfter(checkpointStep)
+        self.restoreSnapshot(snapshot)
+        return checkpointStep
+
+    #go back to the given step by restoring the checkpoint before it and 
+    #simulating forward. onStep(environ, step) is called before each step
+    #is simulated, to add the forces that were on the objects at that step.
+    #returns true if a BridgeBed broke while simulating forward
+    def replayTo(self, step, dt, width, height, onStep=None):
+        self.restoreCheckpoint(step)
+        hasBroken = False
+        while(self.stepCount < step):
+            if(onStep != None):
+                onStep(self, self.stepCount)
+            if(self.update(dt, width, height)):
+                hasBroken = True
+        return hasBroken
+
+    #save the state of every object (see Snapshot)
+    def getSnapshot(self):
+        return Snapshot(self)
+
+    #replace all of the objects with the ones saved in the snapshot
+    def restoreSnapshot(self, snapshot):
+        nodes = snapshot.restore(self)
+        #(the old positions were set straight in the particle store)
+        self.positionsChanged()
+        self.nodeGrid.markDirty()
+        return nodes
+
+    #the broadphase and the node sets keep track of objects by id, so they
+    #are rebuilt instead of copied when the environment is copied
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["broadphase"]
+        del state["collidableSets"]
+        del state["islands"]
+        del state["nodeGrid"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.setBroadphase(self.broadphaseMode)
+        self.collidableSets = NodeSets(self, True)
+        self.collidableSets.markDirty()
+        self.islands = Islands(self)
+        self.islands.markDirty()
+        self.nodeGrid = NodeGrid(self)
+        self.particles.wakeAll()
+
+    #change how possible collisions are found 
+    #"sweep" sweeps along the x axis (best for a few weights)
+    #"grid" uses a uniform grid (best for lots of weights)
+    def setBroadphase(self, mode):
+        if(mode == "sweep"):
+            broadphase = SweepAndPrune(self)
+        elif(mode == "grid"):
+            broadphase = SpatialHash(self)
+        else:
+            raise Exception("unknown broadphase: %s" % mode)
 
-        self.resolveIterations = 5
-        self.debug = False
+        self.broadphaseMode = mode
+        self.broadphase = broadphase
+        for obj in self.objects:
+            if(isinstance(obj, Constraint) or isinstance(obj, Weight)):
+                broadphase.add(obj)
 
     #start the simulation (or restart it)
     def start(self):
@@ -128,6 +1248,7 @@ class PhysEnvironment(object):
             #init all constraints for starting the animation
             for index in self.constraintIndexes:
                 self.objects[index].initForSim()
+            self.topologyChanged()
 
         self.isSimulating = True
         self.hasStarted = True
@@ -172,6 +1293,43 @@ class PhysEnvironment(object):
 
         return position.getXY()
 
+    #the screen coordinates every particle slot is drawn at (see 
+    #PhysObject.getDrawPosition) as two arrays (x and y), all worked out in
+    #one pass. They are kept (for drawing and clicking) until a particle 
+    #moves or the origin, screenConversion or renderAlpha change
+    def getScreenCoords(self):
+        (x0, y0) = self.origin.getXY()
+        scale = self.screenConversion
+        alpha = self.renderAlpha
+        key = (x0, y0, scale, alpha)
+        if(self.screenCoords != None and self.screenCoordsKey == key):
+            return self.screenCoords
+
+        particles = self.particles
+        (xs, ys) = (particles.x, particles.y)
+        if(alpha < 1):
+            #in between the last position and the current one
+            (oldXs, oldYs) = (particles.oldX, particles.oldY)
+            hasOld = particles.hasOld
+            xs = [oldXs[i] + (xs[i] - oldXs[i]) * alpha if hasOld[i] 
+                  else xs[i] for i in xrange(len(xs))]
+            ys = [oldYs[i] + (ys[i] - oldYs[i]) * alpha if hasOld[i] 
+                  else ys[i] for i in xrange(len(ys))]
+
+        #scale to pixels, flip y (the window's y goes down) and shift by 
+        #the origin (same as getScreenXY)
+        screenX = array("d", [x * scale + x0 for x in xs])
+        screenY = array("d", [y0 - y * scale for y in ys])
+
+        self.screenCoords = (screenX, screenY)
+        self.screenCoordsKey = key
+        return self.screenCoords
+
+    #called when particles move or change slots so the screen coordinates 
+    #are worked out again
+    def positionsChanged(self):
+        self.screenCoords = None
+
     #add the given object to the environments list
     def add(self, obj):
         #add to the list of objects
@@ -179,92 +1337,103 @@ class PhysEnvironment(object):
         #get the objects index in the list
         index = len(self.objects) - 1
 
-        #add the index to specialized lists if needed
+        #physics objects keep their state in the particle store
+        if(isinstance(obj, PhysObject)):
+            self.particles.attach(obj)
+            self.positionsChanged()
+
+        #add the index to specialized lists, and keep track of where it is
+        #in that list so it can be removed quickly
+        indexList = self.getIndexList(obj)
+        obj.indexListIndex = len(indexList)
+        indexList.append(index)
+
         if(isinstance(obj, Constraint)):
-            self.constraintIndexes.append(index)
+            self.broadphase.add(obj)
+            self.solver.markDirty()
+            self.collidableSets.addConstraint(obj)
+            self.islands.addConstraint(obj)
         elif(isinstance(obj, Weight)):
-            self.weightIndexes.append(index)
-        else:
-            self.otherIndexes.append(index)
+            self.broadphase.add(obj)
+        elif(isinstance(obj, Node)):
+            self.nodeGrid.add(obj)
 
         #return the index so the object can keep track of its position
         return index
 
+    #returns the specialized index list the object's index belongs in
+    def getIndexList(self, obj):
+        if(isinstance(obj, Constraint)):
+            return self.constraintIndexes
+        elif(isinstance(obj, Weight)):
+            return self.weightIndexes
+        else:
+            return self.otherIndexes
+
+    #called whenever constraints are removed or change nodes so that 
+    #anything cached about them is rebuilt
+    #nodes are the nodes of the constraints that were removed or changed
+    #(their islands are woken up, see Islands.markDirty)
+    def topologyChanged(self, nodes=()):
+        self.solver.markDirty()
+        self.collidableSets.markDirty()
+        self.islands.markDirty(nodes)
+
+    #called when an object's position is set directly (not by the simulation)
+    def particleMoved(self, obj):
+        self.drawPositionChanged(obj)
+        if(isinstance(obj, Node)):
+            self.collidableSets.nodeMoved(obj)
+            self.islands.wake(obj)
+
+    #called when where the object is drawn changed (by setting its position 
+    #or its old position directly)
+    def drawPositionChanged(self, obj):
+        self.positionsChanged()
+        if(isinstance(obj, Node)):
+            self.nodeGrid.moved(obj)
+
+    #wake up the island the object is in (if it is asleep)
+    def wake(self, obj):
+        if(isinstance(obj, Node)):
+            self.islands.wake(obj)
+
     #delete the object from the environment
     def deleteObj(self, obj, objIndex):
-        #remove from the list by shifting everything else down
-        for i in xrange(objIndex, len(self.objects) - 1):
-            self.objects[i] = self.objects[i+1]
-            #update the constraint's index
-            self.objects[i].environIndex = i
-
-        #get rid of the tail element (that is a duplicate)
-        del self.objects[-1]
-
-        #recalculate indexes
-        self.constraintIndexes = []
-        self.weightIndexes = []
-        self.otherIndexes = []
-        for i in xrange(len(self.objects)):
-            if(isinstance(self.objects[i], Constraint)):
-                self.constraintIndexes.append(i)
-            elif(isinstance(self.objects[i], Weight)):
-                self.weightIndexes.append(i)
-            else:
-                self.otherIndexes.append(i)
-
-    #get a list of all edges of all (collidable) objects 
-    #edges in the form (xval, index, "R"/"L")
-    def generateEdgeList(self):
-        edgeList = []
-
-        for obj in self.objects:
-            edgeList += obj.getEdges()
-
-        edgeList.sort()
-        return edgeList
-
-    #returns a list of the nodes left  of the screens edge that are connected
-    #to a collidable constraint
-    def getLeftCollidableNodes(self, leftScreenEdge):
-        leftNodes = []
-        for obj in self.objects:
+        self.removeItem(obj)
+        if(isinstance(obj, Constraint) or isinstance(obj, Weight)):
+            self.broadphase.remove(obj)
+        if(isinstance(obj, PhysObject)):
+            moved = self.particles.detach(obj)
+            self.positionsChanged()
             if(isinstance(obj, Node)):
-                x = obj.position.getXY()[0]
-                if(x < leftScreenEdge):
-                    #only assign if there is a collidable constraint on the obj
-                    for constraint in obj.constraints:
-                        if(constraint.isCollidable):
-                            leftNodes.append(obj)
-                            break
-        return leftNodes
-
-    #is there a path from the given constraint to the right side
-    def isCovered(self, node, rightSide, seen=None, depth=0):
-        if(seen == None):
-            seen = set()
-
-        if(node.position.getXY()[0] >= rightSide):
-            #the node is past the right side.
-            return True
-        elif(node in seen):
-            #already been to this node. 
-            return False
-        else:
-            seen.add(node)
-            #check all collidable constraints
-            for constraint in node.constraints:
-                #get the other node in the constraint
-                if(constraint.nodes[0] is node):
-                    newNode = constraint.nodes[1]
-                else:
-                    newNode = constraint.nodes[0]
-                
-                if(constraint.isCollidable and 
-                   self.isCovered(newNode, rightSide, seen, depth+1)):
-                    return True
-
-            return False                    
+                self.nodeGrid.remove(obj)
+            #constraints on a node that changed slots need to be updated
+            if(isinstance(moved, Node) and len(moved.constraints) > 0):
+                self.solver.markDirty()
+        elif(isinstance(obj, Constraint)):
+            self.topologyChanged(obj.nodes)
+
+        #remove the index from its specialized list by moving the last index
+        #in that list into its place
+        indexList = self.getIndexList(obj)
+        lastIndex = indexList.pop()
+        if(obj.indexListIndex < len(indexList)):
+            indexList[obj.indexListIndex] = lastIndex
+            self.objects[lastIndex].indexListIndex = obj.indexListIndex
+
+        #remove the object from the list by moving the last object into 
+        #its place (so the cost doesn't depend on how many objects there are)
+        lastObj = self.objects.pop()
+        if(lastObj is not obj):
+            self.objects[objIndex] = lastObj
+            lastObj.environIndex = objIndex
+            self.getIndexList(lastObj)[lastObj.indexListIndex] = objIndex
+
+    #delete all of the given objects from the environment
+    def deleteObjs(self, objs):
+        for obj in objs:
+            obj.delete()
 
     #checks if the bridge covers the gap (checks if there is a path of
     #collidable(bed or land beams) that spans the entire screen
@@ -274,11 +1443,10 @@ class PhysEnvironment(object):
 
         rightEdge = leftEdge + self.getEnvironScalar(screenWidth)
 
-        #list of all collidable constraints with (leftX, rightX)
-        leftNodes = self.getLeftCollidableNodes(leftEdge)
-
-        for node in leftNodes:
-            if(self.isCovered(node, rightEdge)):
+        #the nodes connected by collidable constraints are kept in sets, so 
+        #just check if any set reaches past both edges
+        for (minX, maxX) in self.collidableSets.getExtents():
+            if(minX < leftEdge and maxX >= rightEdge):
                 return True
         return False
 
@@ -286,90 +1454,255 @@ class PhysEnvironment(object):
     # my roomate helped me get it to this point
     #resolves all collisions in the environment but only checks when two 
     #objects are above one another in order to improve efficiency
+    #(the sweep itself is done by the broadphase). Returns the deepest 
+    #penetration found (in meters)
     def resolveCollisions(self):
-        #list of tuples in the form: (xVal, index, "R"/"L" (right or left))
-        #note: xval is in environ coordinates
-        edgeList = self.generateEdgeList()
-
-        #the list of objects that could be colliding
-        #when adding an obj to this list the algorithm resolves all collisions
-        #with the objects in the list and the new object. That means that it 
-        #can assume none of the objects in the list are colliding
-        objList = []
-
-        #go through all edges and only check collisions when 2+ objects
-        for edge in edgeList:
-            (x, i, side) = edge
-
-            if(side == "L"):
-                #left side, add it to the list
-                newObj = self.objects[i]
-
-                #only need to check collisions if the list isn't empty
-                if(len(objList) > 0):
-                    #if the new obj is a weight, just pass it the list of obj
-                    if(isinstance(newObj, Weight)):
-                        newObj.fixCollisions(objList)
-                    #if it is not a weight, compare all weights in the objList
-                    #with it
-                    else:
-                        for i in xrange(len(objList)):
-                            if(isinstance(objList[i], Weight)):
-                                objList[i].fixCollisions([newObj])
-                #add the object to the list after collisions resolved
-                objList.append(newObj)
-            #if it is the right side, just remove it
-            elif(side == "R"):
-                for index in xrange(len(objList)):
-                    if(objList[index].environIndex == i):
-                        objList.pop(index)
-                        break
+        pairs = self.broadphase.getPairs()
+        if(self.profiler != None): 
+            self.profiler.endPhase("broadphase", len(pairs))
+        maxDepth = self.fixCollisionPairs(pairs)
+        if(self.profiler != None): self.profiler.endPhase("collisions")
+        return maxDepth
+
+    #fix the collisions between the (weight, obj) pairs found by the
+    #broadphase, straight from the particle store. Squared distances are 
+    #compared so only the pairs that actually collide need a square root.
+    #Returns the deepest penetration that was fixed (in meters)
+    #collision resolution algorithm adapted from:
+    #http://www.gotoandplay.it/_articles/2005/08/advCharPhysics.php
+    def fixCollisionPairs(self, pairs):
+        particles = self.particles
+        (x, y, isFixed) = (particles.x, particles.y, particles.isFixed)
+        asleep = particles.asleep
+        conversion = float(self.screenConversion)
+        maxDepth = 0
+
+        for (weight, obj) in pairs:
+            w = weight.particleIndex
+            (weightX, weightY) = (x[w], y[w])
+            weightR = weight.r / conversion
+
+            if(isinstance(obj, Weight)):
+                #vector from this weight to the other weight's center
+                o = obj.particleIndex
+                centerX = x[o] - weightX
+                centerY = y[o] - weightY
+                dist2 = centerX*centerX + centerY*centerY
+                minDist = weightR + obj.r / conversion
+                if(dist2 >= minDist*minDist or dist2 == 0):
+                    continue
+
+                #move the two weights so they are not overlapping
+                dist = math.sqrt(dist2)
+                if(minDist - dist > maxDepth): maxDepth = minDist - dist
+                scale = 0.5 * (dist - minDist) / dist
+                x[w] += centerX * scale
+                y[w] += centerY * scale
+                x[o] -= centerX * scale
+                y[o] -= centerY * scale
+
+            elif(obj.isCollidable):
+                i = obj.nodes[0].particleIndex
+                j = obj.nodes[1].particleIndex
+                #vectors from node 0 to the weight and to node 1
+                (dx, dy) = (weightX - x[i], weightY - y[i])
+                (cx, cy) = (x[j] - x[i], y[j] - y[i])
+
+                #the weight is only over the constraint if the angles between
+                #the constraint and each node->weight vector are acute
+                dot = dx*cx + dy*cy
+                if(dot <= 0 or (weightX - x[j])*cx + (weightY - y[j])*cy >= 0):
+                    continue
+
+                #vector perpendicular to the constraint to the weight's center
+                proj = dot / (cx*cx + cy*cy)
+                perpX = proj*cx - dx
+                perpY = proj*cy - dy
+                dist2 = perpX*perpX + perpY*perpY
+                minDist = weightR + (obj.width/2) / conversion
+                if(dist2 >= minDist*minDist or dist2 == 0):
+                    continue
+
+                #the weight hit a sleeping island
+                if(asleep[i] or asleep[j]):
+                    self.wake(obj.nodes[0])
+                    self.wake(obj.nodes[1])
+
+                #split the correction between the weight and the constraint
+                dist = math.sqrt(dist2)
+                if(minDist - dist > maxDepth): maxDepth = minDist - dist
+                scale = (dist - minDist) / dist
+                weightScale = weight.collisionRatio * scale
+                constraintScale = (1 - weight.collisionRatio) * scale
+                x[w] += perpX * weightScale
+                y[w] += perpY * weightScale
+                if(not isFixed[i]):
+                    x[i] -= perpX * constraintScale
+                    y[i] -= perpY * constraintScale
+                if(not isFixed[j]):
+                    x[j] -= perpX * constraintScale
+                    y[j] -= perpY * constraintScale
+
+        return maxDepth
 
     #resolve all collisisons and constraints in the system
     def resolveCollisionsConstraints(self):
-        #resolve multiple times each loop to approx best resolution
+        #resolve multiple times each loop to approx best resolution, 
+        #stopping early once everything is within tolerance
+        self.lastIterations = 0
         for iteration in xrange(self.resolveIterations):
-                #fixedCollisions = True
-
-                self.resolveCollisions()
+                maxDepth = self.resolveCollisions()
 
                 #resolve constraints
-                for index in self.constraintIndexes:
-                    self.objects[index].resolve()
+                maxRatio = self.solver.resolve()
+                if(self.profiler != None): 
+                    self.profiler.endPhase("constraints")
+                self.lastIterations += 1
+
+                if(maxDepth < self.collisionTolerance and 
+                   maxRatio < self.resolveTolerance):
+                    break
+
+    #move every free particle forward one step using verlet integration
+    #(done for the whole particle store at once instead of one object at a 
+    #time). Forces added to the objects and gravity are both applied, and 
+    #the force accumulators are reset.
+    #found verlet at: 
+    #http://www.gotoandplay.it/_articles/2005/08/advCharPhysics.php
+    def integrate(self, dt):
+        particles = self.particles
+        (x, y) = (particles.x, particles.y)
+        (oldX, oldY, hasOld) = (particles.oldX, particles.oldY, 
+                                particles.hasOld)
+        (forceX, forceY) = (particles.forceX, particles.forceY)
+        (invMass, isFixed) = (particles.invMass, particles.isFixed)
+
+        dt2 = dt**2
+        #first step uses x' = x + (1/2)*a*dt**2 (initial velocity is zero)
+        firstDt2 = 0.5 * dt2
+        gravity = self.gravity
+
+        asleep = particles.asleep
+
+        for i in xrange(len(particles)):
+            if(isFixed[i] or asleep[i]):
+                continue
+            m = invMass[i]
+            accelX = forceX[i] * m
+            accelY = forceY[i] * m - (gravity if m != 0 else 0)
+            (curX, curY) = (x[i], y[i])
+
+            if(hasOld[i]):
+                #x' = 2*x - oldX + a*dt**2
+                x[i] = 2 * curX - oldX[i] + accelX * dt2
+                y[i] = 2 * curY - oldY[i] + accelY * dt2
+            else:
+                x[i] = curX + accelX * firstDt2
+                y[i] = curY + accelY * firstDt2
+                hasOld[i] = 1
+
+            oldX[i] = curX
+            oldY[i] = curY
+            forceX[i] = 0.0
+            forceY[i] = 0.0
+
+    #returns a list of the weights that have left the screen 
+    #(width x height pixels) and marks them as not in the screen
+    def getOffScreenWeights(self, width, height):
+        particles = self.particles
+        (x0, y0) = self.origin.getXY()
+        scale = self.screenConversion
+        offScreen = []
+        for index in self.weightIndexes:
+            weight = self.objects[index]
+            i = weight.particleIndex
+            #(same as getScreenXY, without making vectors)
+            x = particles.x[i] * scale + x0
+            y = y0 - particles.y[i] * scale
+            r = weight.r
+
+            if(y - r > height or y + r < 0 or x - r > width or x + r < 0):
+                weight.inScreen = False
+                offScreen.append(weight)
+        return offScreen
 
     #update each object in the list, assume each is a physObject
-    #returns true if a constraint broke, false otherwise
+    #returns true if a BridgeBed broke, false otherwise
     def update(self, dt, width, height):
         if(self.isSimulating):
-            self.resolveCollisionsConstraints()
-
-            objToDelete = []
-            #once constraints and collisions handled, update objects
-            for index in self.otherIndexes + self.weightIndexes:
-                self.objects[index].update(dt, width, height)
-                if(not self.objects[index].inScreen):
-                    #check if the object exited the bottom
-                    (x, y) = self.getScreenXY(self.objects[index].position)
-
-                    #delete the object either way
-                    if(not isinstance(self.objects[index], Node)):
-                        objToDelete.append(self.objects[index])
+            isBroken = self.simulateStep(dt, width, height)
+            self.positionsChanged()
+            self.nodeGrid.markDirty()
+            self.stepCount += 1
+            if(self.checkpoints != None):
+                self.checkpoints.stepped(self)
+            return isBroken
+
+    #move the simulation forward one step (see update)
+    def simulateStep(self, dt, width, height):
+        #if everything is asleep (and there are no weights to wake 
+        #anything up) nothing can move or break
+        if(self.particles.isIdle() and len(self.weightIndexes) == 0):
+            return False
 
-            for obj in objToDelete:
-                obj.delete()
+        profiler = self.profiler
+        if(profiler != None): profiler.startStep(self)
+
+        self.resolveCollisionsConstraints()
+        #(compares the relaxed positions to the ones from the last step)
+        self.islands.update()
+        if(profiler != None): profiler.endPhase("islands")
+
+        #once constraints and collisions handled, update objects
+        self.integrate(dt)
+        self.collidableSets.allMoved()
+        if(profiler != None): profiler.endPhase("integrate")
+        self.deleteObjs(self.getOffScreenWeights(width, height))
+        if(profiler != None): profiler.endPhase("offScreen")
+
+        isBroken = self.checkForBreaks()
+        if(profiler != None): 
+            profiler.endPhase("breaks")
+            profiler.endStep(self)
+        return isBroken
+
+    #check for broken constraints (constraints that can't move can't break).
+    #returns true as soon as a BridgeBed breaks
+    def checkForBreaks(self):
+        for index in self.constraintIndexes:
+            if(self.objects[index].isStatic()):
+                continue
+            isBroken = self.objects[index].checkForBreak()
+            if(isBroken and isinstance(self.objects[index], BridgeBed)):
+                return True
 
-            #check for broken constraints
-            for index in self.constraintIndexes:
-                isBroken = self.objects[index].checkForBreak()
-                if(isBroken and isinstance(self.objects[index], BridgeBed)):
-                    return True
+        #no objects broken
+        return False
 
-            #no objects broken
-            return False
+    #start recording how long each part of update takes for (at most) the
+    #last maxSteps steps. The records are in self.profiler
+    def startProfiling(self, maxSteps=300):
+        if(self.profiler == None):
+            startCounting()
+        self.profiler = StepProfiler(maxSteps)
+        return self.profiler
+
+    def stopProfiling(self):
+        if(self.profiler != None):
+            stopCounting()
+        self.profiler = None
     
-    #draw all the objects in the simulation
+    #draw all the objects in the simulation. Every object keeps one canvas
+    #item (tagged "physics") between frames that is only changed when the 
+    #object moves or changes color, so the canvas shouldn't be cleared 
+    #between draws (see clearDrawing)
     def draw(self, canvas, debug=False):
-        #draw objects so constraints are in front but behind nodes
+        for item in self.deletedItems:
+            canvas.delete(item)
+        self.deletedItems = []
+        if(self.isSimulating):
+            self.updateColors()
+
         for index in self.weightIndexes:
             self.objects[index].draw(canvas, debug)
 
@@ -379,69 +1712,207 @@ class PhysEnvironment(object):
         for index in self.otherIndexes:
             self.objects[index].draw(canvas, debug)
 
+        #new items go on top, so put the layers back in order: constraints 
+        #in front of weights but behind nodes (and the debug text in front 
+        #of everything)
+        if(self.itemsAdded):
+            canvas.tag_raise("constraint")
+            canvas.tag_raise("node")
+            if(debug):
+                canvas.tag_raise("debug")
+            self.itemsAdded = False
+
+    #update the stress color of every constraint that has one (see 
+    #Constraint.colorTable). The color steps are all worked out in one 
+    #pass, then only constraints whose step changed are recolored
+    def updateColors(self):
+        objects = self.objects
+        constraints = [objects[index] for index in self.constraintIndexes]
+        constraints = [constraint for constraint in constraints 
+                       if constraint.colorTable != None]
+        steps = Constraint.colorSteps
+        buckets = [int(round(constraint.lenRatio / constraint.breakRatio * 
+                             steps)) for constraint in constraints]
+        for k in xrange(len(constraints)):
+            bucket = min(max(buckets[k], -steps), steps) + steps
+            if(bucket != constraints[k].colorBucket):
+                constraints[k].setColorBucket(bucket)
+
+    #remove every object's item from the canvas (they are made again on 
+    #the next draw)
+    def clearDrawing(self, canvas):
+        canvas.delete("physics")
+        for obj in self.objects:
+            obj.canvasItem = None
+        self.deletedItems = []
+
+    #make the object's canvas item the first time it is drawn, after that
+    #only move it or change its color when those changed. layer is the 
+    #object's tag ("weight", "constraint" or "node") and create is the 
+    #canvas method that makes the item
+    def drawItem(self, canvas, obj, layer, create, coords, color, **options):
+        if(obj.canvasItem == None):
+            obj.canvasItem = create(*coords, fill=color, 
+                                    tags=("physics", layer), **options)
+            (obj.drawnCoords, obj.drawnColor) = (coords, color)
+            self.itemsAdded = True
+            return
+
+        if(coords != obj.drawnCoords):
+            canvas.coords(obj.canvasItem, *coords)
+            obj.drawnCoords = coords
+        if(color != obj.drawnColor):
+            canvas.itemconfig(obj.canvasItem, fill=color)
+            obj.drawnColor = color
+
+    #take the object's item off of the canvas on the next draw
+    def removeItem(self, obj):
+        if(obj.canvasItem != None):
+            self.deletedItems.append(obj.canvasItem)
+            obj.canvasItem = None
+
     #returns the object at the given screen coords or none
+    #(only nodes can be clicked, constraints never are)
     def getClickedObj(self, screenX, screenY):
-        #look at objects first, then constraints
-        for index in self.otherIndexes:
-            if(self.objects[index].isClicked(screenX, screenY)):
-                return self.objects[index]
-
-        for index in self.constraintIndexes:
-            if(self.objects[index].isClicked(screenX, screenY)):
-                return self.objects[index]
+        return self.nodeGrid.getClicked(screenX, screenY)
 
 #the base class for all objects that respond to basic physics
+#the object's state lives in the environment's particle store, the object
+#only keeps the index of its slot (particleIndex)
 class PhysObject(object):
     #creates a physics object
     #position: vector pointing to the objects coordinates in the environment
     #environment: the physics environment that this particle is in relation to
     #isFixed: boolean for if the object is fixed in space
-    def __init__(self, position, mass, environment):
+    def __init__(self, position, mass, environment, isFixed=False):
         self.environ = environment
-        #add the new object to the environment and get the index of the object
-        self.environIndex = self.environ.add(self)
-
-        self.position = position
-        self.oldPosition = None #will be needed in update func
         self.mass = mass
+        self.isFixed = isFixed
 
-        self.accel = Vector(0, 0) #no acceleration yet
+        #state used until the object is added to the store (and kept while
+        #it is removed from the environment, ex: for undo/redo)
+        #(x, y, oldX, oldY, hasOld, forceX, forceY)
+        self.particleIndex = None
+        (x, y) = position.getXY()
+        self.detachedState = (x, y, 0.0, 0.0, 0, 0.0, 0.0)
+        #the object's item on the canvas (None until it is drawn)
+        self.canvasItem = None
 
-        #force due to gravity
-        self.Fg = Vector(0, -self.environ.gravity) * self.mass
-        self.force = Vector(0, 0) #Fg will be added on update
+        #add the new object to the environment and get the index of the object
+        self.environIndex = self.environ.add(self)
 
         #by default the basic object is always in the screen
         self.inScreen = True
 
-    #add the given force to the object and update the acceleration
+    #the position of the object (in meters)
+    @property
+    def position(self):
+        i = self.particleIndex
+        if(i == None):
+            (x, y) = self.detachedState[:2]
+            return Vector(x, y)
+        particles = self.environ.particles
+        return Vector(particles.x[i], particles.y[i])
+
+    @position.setter
+    def position(self, position):
+        (x, y) = position.getXY()
+        i = self.particleIndex
+        if(i == None):
+            self.detachedState = (x, y) + self.detachedState[2:]
+        else:
+            self.environ.particles.x[i] = x
+            self.environ.particles.y[i] = y
+            self.environ.particleMoved(self)
+
+    #the position of the object on the last update (None before the first)
+    @property
+    def oldPosition(self):
+        i = self.particleIndex
+        if(i == None):
+            (oldX, oldY, hasOld) = self.detachedState[2:5]
+        else:
+            particles = self.environ.particles
+            (oldX, oldY) = (particles.oldX[i], particles.oldY[i])
+            hasOld = particles.hasOld[i]
+        return Vector(oldX, oldY) if hasOld else None
+
+    @oldPosition.setter
+    def oldPosition(self, position):
+        if(position == None):
+            (oldX, oldY, hasOld) = (0.0, 0.0, 0)
+        else:
+            (oldX, oldY) = position.getXY()
+            hasOld = 1
+        i = self.particleIndex
+        if(i == None):
+            state = self.detachedState
+            self.detachedState = state[:2] + (oldX, oldY, hasOld) + state[5:]
+        else:
+            particles = self.environ.particles
+            particles.oldX[i] = oldX
+            particles.oldY[i] = oldY
+            particles.hasOld[i] = hasOld
+            self.environ.drawPositionChanged(self)
+
+    #the total force added to the object since the last update
+    @property
+    def force(self):
+        i = self.particleIndex
+        if(i == None):
+            (forceX, forceY) = self.detachedState[5:]
+            return Vector(forceX, forceY)
+        particles = self.environ.particles
+        return Vector(particles.forceX[i], particles.forceY[i])
+
+    @force.setter
+    def force(self, force):
+        (forceX, forceY) = force.getXY()
+        i = self.particleIndex
+        if(i == None):
+            self.detachedState = self.detachedState[:5] + (forceX, forceY)
+        else:
+            self.environ.particles.forceX[i] = forceX
+            self.environ.particles.forceY[i] = forceY
+
+    #acceleration due to the added forces (not including gravity)
+    @property
+    def accel(self):
+        return self.force / self.mass
+
+    #the position to draw the object at: between the position from the last
+    #step and the current one, based on the environment's renderAlpha
+    def getDrawPosition(self):
+        i = self.particleIndex
+        alpha = self.environ.renderAlpha
+        particles = self.environ.particles
+        if(i == None or alpha >= 1 or not particles.hasOld[i]):
+            return self.position
+
+        (oldX, oldY) = (particles.oldX[i], particles.oldY[i])
+        return Vector(oldX + (particles.x[i] - oldX) * alpha, 
+                      oldY + (particles.y[i] - oldY) * alpha)
+
+    #the screen coordinates the object is drawn at (see getDrawPosition)
+    def getScreenXY(self):
+        i = self.particleIndex
+        if(i == None):
+            return self.environ.getScreenXY(self.position)
+        (screenX, screenY) = self.environ.getScreenCoords()
+        return (screenX[i], screenY[i])
+
+    #add the given force to the object (waking it up if it is asleep)
     def addForce(self, newForce):
-        self.force += newForce
-        self.accel = self.force / self.mass
-
-    #update the particle's position based on verlet integration
-    #found verlet at: 
-    #http://www.gotoandplay.it/_articles/2005/08/advCharPhysics.php
-    def update(self, dt, width, height):
-        #add force due to gravity
-        self.addForce(self.Fg)
-
-        if(self.oldPosition == None):
-            #first time updating, calculate new position using regular
-            #kinematics equation: x' = x + v*dt + (1/2)*a*dt**2
-            #however, initial velocity is zero so v*dt = 0
-            newPosition = (self.position + 0.5 * self.accel * dt**2)
+        (forceX, forceY) = newForce.getXY()
+        i = self.particleIndex
+        if(i == None):
+            self.force += newForce
         else:
-            #calculate new position using verlet
-            #x' = 2*x - oldX + a*dt**2
-            newPosition = (2 * self.position - self.oldPosition + 
-                           self.accel * dt**2)
-
-        self.oldPosition = self.position
-        self.position = newPosition
-        
-        #reset force for next time through the loop
-        self.force = Vector.zero()
+            particles = self.environ.particles
+            if(particles.asleep[i] and (forceX != 0 or forceY != 0)):
+                self.environ.wake(self)
+            particles.forceX[i] += forceX
+            particles.forceY[i] += forceY
 
     #delete the object from the environment
     def delete(self):
@@ -451,26 +1922,18 @@ class PhysObject(object):
     def draw(self, canvas, debug=False):
         #base object just draws a black circle
         r = 5
-        (x, y) = self.environ.getScreenXY(self.position)
+        (x, y) = self.getScreenXY()
 
-        canvas.create_oval(x-r, y-r, x+r, y+r, fill="black")
+        self.environ.drawItem(canvas, self, "node", canvas.create_oval, 
+                              (x-r, y-r, x+r, y+r), "black")
         if(debug):
-            canvas.create_text(x, y, text=self.environIndex)
+            canvas.create_text(x, y, text=self.environIndex, tags="debug")
 
     #check if the object was clicked
     def isClicked(self, x, y):
         #by default the object's can't be clicked
         return False
 
-    #Fix any collisions and return true if any collisions fixed
-    def fixCollisions(self, objList):
-        return False
-
-    #return edges in the form (xval, index, "R"/"L")
-    #by default, don't return anything since it is not collidable
-    def getEdges(self):
-        return []
-
     def __eq__(self, other):
         if(isinstance(other, PhysObject)):
             return ((self.position == other.position) and 
@@ -486,25 +1949,17 @@ class Node(PhysObject):
         self.constraints = []
         #list of indexes of the node in the constraints' node list
         self.constraintIndexes = []
+        #drawing constants (the radius is needed when it is added)
+        self.r = 10
 
-        #if the node is fixed in space
-        self.isFixed = isFixed
-
-        super(Node, self).__init__(position, mass, environ)
+        super(Node, self).__init__(position, mass, environ, isFixed)
 
-        #drawing constants
-        self.r = 10
         self.color = color
         self.visible = visible
 
     def __hash__(self):
         return hash(str(self.position.getXY()) + self.color)
 
-    #update particle only if it is not fixed        
-    def update(self, dt, width, height):
-        if(not self.isFixed):
-            super(Node, self).update(dt, width, height)
-
     #create a constraint between this node and another node
     def addConstraint(self, constraint, nodeIndex):
         constraintIndex = len(self.constraints)
@@ -538,19 +1993,23 @@ class Node(PhysObject):
     #draw the node (if visisble)
     def draw(self, canvas, debug=False):
         r = self.r
-        (x, y) = self.environ.getScreenXY(self.position)
+        (x, y) = self.getScreenXY()
 
         if(self.visible):
-            canvas.create_oval(x-r, y-r, x+r, y+r, fill=self.color)
+            self.environ.drawItem(canvas, self, "node", canvas.create_oval,
+                                  (x-r, y-r, x+r, y+r), self.color)
+        else:
+            self.environ.removeItem(self)
         #optional debug info
         if(debug):
-            canvas.create_text(x, y, text=len(self.constraints), fill="white")
+            canvas.create_text(x, y, text=len(self.constraints), fill="white",
+                               tags="debug")
 
     #returns true if the node was clicked, false otherwise
     def isClicked(self, clickX, clickY):
-        #only visible nodes can be clicked
+        #only visible nodes can be clicked (where they are drawn)
         if(self.visible):
-            (x, y) = self.environ.getScreenXY(self.position)
+            (x, y) = self.getScreenXY()
 
             xDist = clickX - x
             yDist = clickY - y
@@ -569,128 +2028,38 @@ class Weight(PhysObject):
 
         super(Weight, self).__init__(*args)
 
-    #fix collisions between two weights
-    def fixWeightWeightCollision(self, otherWeight):
-        #vector from this object to the other object's center
-        centerVect = otherWeight.position - self.position
-        #distance b/w centers
-        dist = centerVect.getMag()
-
-        #minimum distance that the centers can be without colliding
-        minDist = (self.environ.getEnvironScalar(otherWeight.r) + 
-                   self.environ.getEnvironScalar(self.r))
-        #if they are two close, fix the collision
-        if(dist < minDist):
-            #move the two weights so they are not overlapping
-            displacement = dist - (minDist)
-            scaleFactor = displacement / dist
-
-            self.position += centerVect*(1/2.0)*scaleFactor
-            otherWeight.position -= centerVect*(1/2.0)*scaleFactor
-
-    #checks if the weight is above the constraint
-    #aka, can the weight collide with the node
-    def isWeightAboveConstraint(self, constraint):
-        #vector from the 0th node to the wieght
-        nodeWeightVect = self.position - constraint.nodes[0].position
-        otherNodeWeightVect = self.position - constraint.nodes[1].position
-        #get updated dist b/w nodes
-        constraintVect = (constraint.nodes[1].position - 
-                          constraint.nodes[0].position)
-        reverseConstVect = (constraint.nodes[0].position -
-                            constraint.nodes[1].position)
-
-        #the value of cosine of the angle b/w the vects
-        cosTheta0 = nodeWeightVect.getCosTheta(constraintVect)
-        cosTheta1 = otherNodeWeightVect.getCosTheta(reverseConstVect)
-
-        return cosTheta0 > 0 and cosTheta1 > 0
-
-    #returns the vector perpendicular to the constraint, pointing toward
-    #the weight
-    def getWeightConstraintPerpVect(self, constraint):
-        #vector from 0th node to weight
-        nodeWeightVect = self.position - constraint.nodes[0].position
-        #vector from 0th node to 1th node
-        constraintVect = (constraint.nodes[1].position - 
-                          constraint.nodes[0].position)
-        #project the vector to the weight down onto the constraint
-        projection = nodeWeightVect.projOnto(constraintVect)
-
-        #vector perpendicular to constraint to center of ball
-        perpVect = projection - nodeWeightVect
-
-        return perpVect
-
-    #Fix collision between a weight and a constraint
-    def fixWeightConstraintCollision(self, constraint):
-        #minimum distance that the weight and constraint can be before 
-        #colliding
-        minDist = (self.environ.getEnvironScalar(self.r) +
-                   self.environ.getEnvironScalar(constraint.width/2))
-
-        #if the weight is over the constaint
-        if(self.isWeightAboveConstraint(constraint)):
-            perpVect = self.getWeightConstraintPerpVect(constraint)
-            dist = perpVect.getMag()
-
-            if(dist < minDist):
-                displacement = dist - minDist
-                scaleFactor = displacement / dist
-
-                #weight ratio
-                wr = self.collisionRatio
-                #constraint ratio
-                cr = 1-self.collisionRatio
-
-                #adjust the position of the weight
-                self.position += perpVect*wr*scaleFactor
-                #adjust the position of the constraint
-                if(not constraint.nodes[0].isFixed):
-                    constraint.nodes[0].position -= perpVect*cr*scaleFactor
-                if(not constraint.nodes[1].isFixed):
-                    constraint.nodes[1].position -= perpVect*cr*scaleFactor
-
-    #collision resolution algorithm adapted from:
-    #http://www.gotoandplay.it/_articles/2005/08/advCharPhysics.php
-    def fixCollisions(self, objList):
-        for obj in objList:
-            if(isinstance(obj, Weight)):
-                self.fixWeightWeightCollision(obj)
-            elif(isinstance(obj, Constraint) and obj.isCollidable):
-                self.fixWeightConstraintCollision(obj)
-
-    #update the object. return true if it is still in the screen, else false
-    def update(self, dt, width, height):
-        #first, update as usual
-        super(Weight, self).update(dt, width, height)
-
-        #now make sure weight is in canvas
-        (x, y) = self.environ.getScreenXY(self.position)
-        r = self.r
-
-        if(y - r > height or y + r < 0 or x - r > width or x + r < 0):
-            self.inScreen = False
-
     #draw the weight
     def draw(self, canvas, debug=False):
         r = self.r
-        (cx, cy) = self.environ.getScreenXY(self.position)
+        (cx, cy) = self.getScreenXY()
 
-        canvas.create_oval(cx-r, cy-r, cx+r, cy+r, fill=self.color) 
+        self.environ.drawItem(canvas, self, "weight", canvas.create_oval,
+                              (cx-r, cy-r, cx+r, cy+r), self.color)
         if(debug):
-            canvas.create_text(cx, cy, text=self.environIndex)
+            canvas.create_text(cx, cy, text=self.environIndex, tags="debug")
 
-    #get the right and left edges of the weight (xval, index, "R"/"L")
-    def getEdges(self):
-        (x, y) = self.position.getXY()
+    #get the x values of the left and right edges of the weight
+    def getXBounds(self):
+        x = self.environ.particles.x[self.particleIndex]
         r = self.environ.getEnvironScalar(self.r)
-        leftEdge = (x-r, self.environIndex, "L")
-        rightEdge = (x+r, self.environIndex, "R")
-        return [leftEdge, rightEdge]
+        return (x-r, x+r)
 
 #does not extend phys object class because it does not act like a physObject
 class Constraint(object):
+    #constraints that change color with stress look their color up in 
+    #colorTable (made by makeColorTable) instead of working it out. The 
+    #table has a color for every step of lenRatio/breakRatio from -1 
+    #(compressed to breaking) to 1 (stretched to breaking), colorSteps 
+    #steps each way. None if the color doesn't change
+    colorSteps = 50
+    colorTable = None
+    #base color values (R, G, B) and how much they change at breaking 
+    #(increase for red when stretched or blue when compressed, decrease for
+    #the other channels)
+    colorVals = (0, 0, 0)
+    increaseScale = 0
+    decreaseScale = 0
+
     #node1, node2 are the nodes that the constraint is attached to
     #breakRatio is the fraction of the start len the constraint will move
     #before breaking
@@ -698,7 +2067,6 @@ class Constraint(object):
                  baseColor="black"):
         self.isCollidable = collidable
         self.environ = environ
-        self.environIndex = self.environ.add(self)
 
         self.nodes = [node1, node2]
 
@@ -715,6 +2083,13 @@ class Constraint(object):
         self.width = 5
         self.baseColor = baseColor
         self.color = self.baseColor
+        #index of the color in colorTable (None until it is looked up)
+        self.colorBucket = None
+        #the constraint's item on the canvas (None until it is drawn)
+        self.canvasItem = None
+
+        #add to the environment once the nodes are known
+        self.environIndex = self.environ.add(self)
 
         #update basic info
         self.updateInfo()
@@ -724,10 +2099,43 @@ class Constraint(object):
         #update rest length (in case nodes were shifted since creation)
         self.restLen = (self.nodes[0].position-self.nodes[1].position).getMag()
 
-    #this method is overwritten by subclasses
-    #included so the overhead of super not needed each update
+    #the color at displaceRatio (lenRatio/breakRatio, from -1 to 1)
+    @classmethod
+    def getStressColor(cls, displaceRatio):
+        (red, green, blue) = cls.colorVals
+        increaseChange = abs(displaceRatio) * cls.increaseScale
+        decreaseChange = abs(displaceRatio) * cls.decreaseScale
+
+        if(displaceRatio < 0):
+            blue += increaseChange
+            red -= decreaseChange
+            green -= decreaseChange
+        else:
+            red += increaseChange
+            blue -= decreaseChange
+            green -= decreaseChange
+
+        return rgbString(red, green, blue)
+
+    #the list of colors for colorTable
+    @classmethod
+    def makeColorTable(cls):
+        steps = cls.colorSteps
+        return [cls.getStressColor(float(step) / steps) 
+                for step in xrange(-steps, steps + 1)]
+
+    #update the color based on tension/compression (only recolored when 
+    #the color's step in colorTable changes)
     def updateColor(self):
-        pass
+        if(self.colorTable != None):
+            steps = self.colorSteps
+            bucket = int(round(self.lenRatio / self.breakRatio * steps))
+            self.setColorBucket(min(max(bucket, -steps), steps) + steps)
+
+    def setColorBucket(self, bucket):
+        if(bucket != self.colorBucket):
+            self.colorBucket = bucket
+            self.color = self.colorTable[bucket]
 
     #update all variables important for breaking/resolving constraint
     def updateInfo(self):
@@ -751,6 +2159,7 @@ class Constraint(object):
         if(self.environ.debug): 
             print "constraint %d is broken" % self.environIndex
             self.color = "black"
+        oldNodes = list(self.nodes)
         for i in xrange(len(self.nodes)):
             node = self.nodes[i]
             if(len(node.constraints) > 1 or node.isFixed):
@@ -764,16 +2173,16 @@ class Constraint(object):
 
                 self.nodes[i] = newNode
 
-    #based on code from this tutorial:
-    #http://www.gotoandplay.it/_articles/2005/08/advCharPhysics.php
-    def resolve(self):
-        self.updateInfo()
+        self.environ.topologyChanged(oldNodes)
 
-        #shift the nodes to fix the constraints
-        if(not self.nodes[0].isFixed):
-            self.nodes[0].position += self.nodeVect*0.5*self.lenRatio
-        if(not self.nodes[1].isFixed):
-            self.nodes[1].position -= self.nodeVect*0.5*self.lenRatio
+    #true if neither node can move (both are fixed or asleep)
+    def isStatic(self):
+        particles = self.environ.particles
+        for node in self.nodes:
+            i = node.particleIndex
+            if(not (particles.isFixed[i] or particles.asleep[i])):
+                return False
+        return True
 
     #check if the constraint should be broken
     def checkForBreak(self):
@@ -797,111 +2206,57 @@ class Constraint(object):
     def getLength(self):
         return (self.nodes[0].position - self.nodes[1].position).getMag()
 
+    #(the color is updated for every constraint at once, see 
+    #PhysEnvironment.updateColors)
     def draw(self, canvas, debug=False):
-        if(self.environ.isSimulating):
-            self.updateColor()
         #node coordinates
-        (x1, y1) = self.environ.getScreenXY(self.nodes[0].position)
-        (x2, y2) = self.environ.getScreenXY(self.nodes[1].position)
+        (x1, y1) = self.nodes[0].getScreenXY()
+        (x2, y2) = self.nodes[1].getScreenXY()
 
-        canvas.create_line(x1, y1, x2, y2, fill=self.color, width=self.width)
+        self.environ.drawItem(canvas, self, "constraint", canvas.create_line,
+                              (x1, y1, x2, y2), self.color, width=self.width)
 
         if(debug):
-            canvas.create_text((x1+x2)/2, (y1+y2)/2, text=self.environIndex)
-
-    #get edges in the form (xval, index, "R"/"L")
-    def getEdges(self):
-        i = self.environIndex
-
-        (xLeft, xRight) = self.getSortedXVals()
-
-        return [(xLeft, i, "L"), (xRight, i, "R")]
+            canvas.create_text((x1+x2)/2, (y1+y2)/2, text=self.environIndex,
+                               tags="debug")
 
-    #get the xvalues of the edges of the constraint, sorted
-    def getSortedXVals(self):
-        xVals = [self.nodes[0].position.getXY()[0], 
-                 self.nodes[1].position.getXY()[0]]
-        xVals.sort()
-        return tuple(xVals)  
+    #get the x values of the left and right edges of the constraint
+    def getXBounds(self):
+        x = self.environ.particles.x
+        x1 = x[self.nodes[0].particleIndex]
+        x2 = x[self.nodes[1].particleIndex]
+        return (x1, x2) if x1 <= x2 else (x2, x1)
 
     def isClicked(self, xClick, yClick):
         return False
 
 #a non-collidable constraint for bridges
 class BridgeBeam(Constraint):
+    colorVals = (180, 180, 180)
+    increaseScale = 75
+    decreaseScale = 180
+
     def __init__(self, *args):
-        self.colorVals = (180, 180, 180)
         super(BridgeBeam, self).__init__(*args, collidable=False, 
                                          baseColor=rgbString(*self.colorVals))
-
-    #update the color of the constraint based on tension/compression
-    def updateColor(self):
-        increaseScale = 75
-        decreaseScale = 180
-        #base color values
-        (red, green, blue) = self.colorVals
-
-        #displaceRatio is 1 or -1 right at breaking
-        displaceRatio = self.lenRatio/self.breakRatio
-
-        if(displaceRatio > 1): 
-            displaceRatio = 1
-        elif(displaceRatio < -1):
-            displaceRatio = -1
-
-        increaseChange = abs(displaceRatio) * increaseScale
-        decreaseChange = abs(displaceRatio) * decreaseScale
-
-        if(displaceRatio < 0):
-            blue += increaseChange
-            red -= decreaseChange
-            green -= decreaseChange
-        else:
-            red += increaseChange
-            blue -= decreaseChange
-            green -= decreaseChange
-
-        self.color = rgbString(red, green, blue)
         
 #a collicable constraint for bridges     
 class BridgeBed(Constraint):
+    #base color values (R, G, B)
+    colorVals = (100, 100, 100)
+    increaseScale = 155
+    decreaseScale = 100
+
     def __init__(self, *args):
-        #base color values (R, G, B)
-        self.colorVals = (100, 100, 100)
         super(BridgeBed, self).__init__(*args, collidable=True, 
                                         baseColor=rgbString(*self.colorVals))
 
-    #update the color based on 
-    def updateColor(self):
-        increaseScale = 155
-        decreaseScale = 100
-        #base color values
-        (red, green, blue) = self.colorVals
-
-        #displaceRatio is 1 or -1 right at breaking
-        displaceRatio = self.lenRatio/self.breakRatio
-
-        if(displaceRatio > 1): 
-            displaceRatio = 1
-        elif(displaceRatio < -1):
-            displaceRatio = -1
-
-        increaseChange = abs(displaceRatio) * increaseScale
-        decreaseChange = abs(displaceRatio) * decreaseScale
-
-        if(displaceRatio < 0):
-            blue += increaseChange
-            red -= decreaseChange
-            green -= decreaseChange
-        else:
-            red += increaseChange
-            blue -= decreaseChange
-            green -= decreaseChange
-
-        self.color = rgbString(red, green, blue)
-
 # a colidable constraint used for the terrain of the level
 class LandBeam(Constraint):
     def __init__(self, *args):
         super(LandBeam, self).__init__(*args, collidable=True,
                                        baseColor="green")
+
+#the stress colors of the bridge constraints (see Constraint.colorTable)
+BridgeBeam.colorTable = BridgeBeam.makeColorTable()
+BridgeBed.colorTable = BridgeBed.makeColorTable()
@@ -1,23 +1,18 @@
 from eventBasedAnimationClass import EventBasedAnimationClass
 from physics import *
+from levelFile import readFile, writeFile
+import levelFile
+from scoreJournal import ScoreJournal
 from Tkinter import *
 import tkMessageBox
+import atexit
 import time
-import copy
 import os
 import string
 
-#also from notes, #reads from a file
-def readFile(filename, mode="rt"):
-    # rt = "read text"
-    with open(filename, mode) as fin:
-        return fin.read()
-
-#again, from notes, writes to a file
-def writeFile(filename, contents, mode="wt"):
-    # wt = "write text"
-    with open(filename, mode) as fout:
-        fout.write(contents)
+#monotonic clock for timing the simulation (falls back on the wall clock 
+#when there isn't one)
+getTime = getattr(time, "monotonic", time.time)
 
 #handles buttons (from HW 8/9 (the one with farm game))
 class Button(object):
@@ -160,60 +155,18 @@ class PyBridge(EventBasedAnimationClass):
                       self.environ)
 
     #takes a list in text form and convert it to a list of numbers
-    #if there were sublists or tuples, the elements in those are just
-    #added to the number list where the tuple or sub list was
+    #(parsing is done in levelFile so it can be used without Tkinter)
     def textToList(self, text):
-        #remove all spaces
-        text = text.replace(" ", "")
-
-        #remove parens around tuples and brackets around list
-        text = text.replace("(", "")
-        text = text.replace(")", "")
-        text = text.replace("[", "")
-        text = text.replace("]", "")
-
-        numList = text.split(",")
-
-        #convert the strings to numbers
-        for i in xrange(len(numList)):
-            if("." in numList[i]):
-                numList[i] = float(numList[i])
-            else:
-                numList[i] = int(numList[i])
-
-        return numList
+        return levelFile.textToList(text)
 
     #takes a list of tuples in text form and converts it to a regular list
-    #assumes it is a list of tuples
     def textToTupleList(self, text):
-        numList = self.textToList(text)
-
-        #pair off the nubmers again (since they were unpaired when converted
-        #to a number list)
-        finalList = []
-        for i in xrange(0, len(numList), 2):
-            finalList.append((numList[i], numList[i+1]))
-
-        return finalList
+        return levelFile.textToTupleList(text)
 
     #takes a path to a level file and returns a tuple of the node list, 
     #constraint list, start node list, and high score
     def getLevelInfo(self, path):
-        #which line the lists are on in the file
-        nodeListLineIndex = 0
-        constraintListLineIndex = 1
-        startNodeListLineIndex = 2
-        highScoreIndex = 3
-
-        text = readFile(path)
-        text = text.splitlines()
-
-        nodeList = self.textToTupleList(text[nodeListLineIndex])
-        constraintList = self.textToTupleList(text[constraintListLineIndex])
-        startNodeList = self.textToList(text[startNodeListLineIndex])
-        highScore = text[highScoreIndex]
-
-        return (nodeList, constraintList, startNodeList, highScore)
+        return levelFile.getLevelInfo(path)
 
     #takes the appropriate lists and creates adds the specified objects to 
     #the environment. Also sets up high score
@@ -236,7 +189,10 @@ class PyBridge(EventBasedAnimationClass):
         for index in startNodes:
             nodes[index].visible = True
 
-        self.highScore = int(highScore)
+        #the level file has the score it shipped with, the journal has the 
+        #ones made since
+        self.highScore = max(int(highScore), 
+                             self.scoreJournal.getHighScore(self.levelName))
 
     #set up the buttons for the start menu
     def initStartButtons(self):
@@ -387,14 +343,26 @@ class PyBridge(EventBasedAnimationClass):
     #create the environment for the start screen
     def initStartEnviron(self):
         self.initEnviron()
+        #weights can be dropped anywhere on the start/pick screens
+        self.environ.setBroadphase("grid")
         self.placeBridge()
 
     def initTimingConstants(self):
         self.dt = 1/30.0 #seconds (30 fps (for physics simulation))
         self.timerDelay = 10
+        #most physics steps to take in one frame (if the drawing falls 
+        #behind, the simulation slows down instead of trying to catch up)
+        self.maxStepsPerFrame = 5
+        #time that hasn't been simulated yet
+        self.timeAccumulator = 0
+        self.lastFrameTime = getTime()
 
         self.startTime = time.time()
         self.fps = 0
+        #the latest drag event that hasn't been handled yet. Drags can come
+        #in much faster than the frames, so only the last one is handled 
+        #(on the next frame or release)
+        self.pendingDrag = None
 
     def initPhysConstants(self):
         #constants for nodes/springs
@@ -411,12 +379,15 @@ class PyBridge(EventBasedAnimationClass):
 
         self.debug = False
         self.isGameOver = False
+        #the environment whose objects have items on the canvas
+        self.drawnEnviron = None
 
         self.score = 0
 
         #type of object to build with
         self.buildType = None
-        self.buildEnviron = None
+        #snapshot of the environment from build mode (to go back to it)
+        self.buildSnapshot = None
         self.isHelpShown = False
         #the total force applied to the movable bridge bed nodes
         self.testWeight = 0
@@ -431,6 +402,14 @@ class PyBridge(EventBasedAnimationClass):
         self.maxBeamLen = 3        
 
         self.levelFolder = "levels"
+        #high scores are saved here instead of in the level files
+        #(only made the first time, since going back to the menu starts the 
+        #animation over and there should only be one journal writing the file)
+        if(not hasattr(self, "scoreJournal")):
+            self.scoreJournal = ScoreJournal(self.levelFolder + os.sep + 
+                                             "scores.journal")
+            #(write any scores still waiting when the game is closed)
+            atexit.register(self.scoreJournal.close)
         self.levelPrefix = "level_"
         self.fixedNodeColor = "brown"
         self.nodeColor = "black"
@@ -438,6 +417,12 @@ class PyBridge(EventBasedAnimationClass):
         #how much self.testWeight is increased each click
         self.testWeightIncrement = 250
 
+        #test mode keeps a checkpoint every checkpointInterval steps (for 
+        #the last maxCheckpoints checkpoints) and "r" goes back rewindSteps
+        self.checkpointInterval = 30
+        self.maxCheckpoints = 20
+        self.rewindSteps = 90
+
         #one is largest text, two is second largest, etc
         self.titleWeight = 1
         self.subTitleWeight = 2
@@ -486,13 +471,21 @@ class PyBridge(EventBasedAnimationClass):
         self.undoQue = []
         self.redoQue = []
 
+    #drags are handled on the next frame (see pendingDrag), and the frame 
+    #redraws the screen
     def onMouseDragWrapper(self, event):
-        self.onMouseDrag(event)
-        self.redrawAll()
+        self.pendingDrag = event
 
     def onMouseReleasedWrapper(self, event):
+        self.handlePendingDrag()
         self.onMouseReleased(event)
-        self.redrawAll()
+
+    #handle the latest drag event (if there is one)
+    def handlePendingDrag(self):
+        if(self.pendingDrag != None):
+            event = self.pendingDrag
+            self.pendingDrag = None
+            self.onMouseDrag(event)
 
     #place the constraint in the tempconstraint variable
     #create new end node if need be
@@ -677,21 +670,16 @@ class PyBridge(EventBasedAnimationClass):
         return (buttonId != None)
 
     #get the list of levels by looking at the levels folder
+    #(from the level catalog, so the files are only read if they changed)
     def initLevelList(self):
-        path = self.levelFolder
-        prefixLen = 6 #prefix to each file is level_
-        postfixLen = 4 #len of file extension (.txt)
-
         self.levelList = []
         
-        for fileName in os.listdir(path):
-            filePath = path + os.sep + fileName
-            #if it is a file and matches the file naming format
-            if(not os.path.isdir(filePath) and 
-               fileName[:prefixLen]==self.levelPrefix):
-                #add it to the level list with the prefix and suffix removed
-                self.levelList.append((filePath, 
-                                       fileName[prefixLen:-postfixLen]))
+        for level in levelFile.getCatalog(self.levelFolder):
+            #the path identifies the button, the text shows the high score
+            highScore = max(level["highScore"], 
+                            self.scoreJournal.getHighScore(level["name"]))
+            text = "%s (%d %s)" % (level["name"], highScore, self.weightUnits)
+            self.levelList.append((level["path"], text))
 
     #change to pick mode
     def gotoPickMode(self):
@@ -801,6 +789,7 @@ class PyBridge(EventBasedAnimationClass):
         path = self.levelFolder + os.sep + fileName
         writeFile(path, fileContents)
         assert(os.path.exists(path))
+        levelFile.updateCatalog(path)
 
         #notify user that the file was saved
         message = "Your level has been saved!"
@@ -882,30 +871,59 @@ class PyBridge(EventBasedAnimationClass):
             self.mode = "test"
             self.score = 0
             self.testWeight = 0
-            self.buildEnviron = copy.deepcopy(self.environ)
+            self.buildSnapshot = self.environ.getSnapshot()
             self.bedNodes = self.getBedNodeList()
+            #the load on the bed at each step (to replay it after a rewind)
+            self.testLoads = []
+            self.environ.stepCount = 0
             self.environ.start()
+            self.environ.startCheckpoints(self.checkpointInterval, 
+                                          self.maxCheckpoints)
         else:
             message = "Your bridge does not span the gap"
             title = "Invalid Bridge"
             tkMessageBox.showerror(title, message)
 
+    #go back a few seconds in test mode to watch what happened again (the 
+    #loads from the first time are used until it catches back up)
+    def rewindTest(self):
+        checkpoints = self.environ.checkpoints
+        if(checkpoints == None):
+            return
+        step = max(self.environ.stepCount - self.rewindSteps, 
+                   checkpoints.getSteps()[0])
+        #(the checkpoint was taken while running, but a paused test should 
+        #stay paused)
+        isSimulating = self.environ.isSimulating
+        self.environ.restoreCheckpoint(step)
+        self.environ.isSimulating = isSimulating
+        #the bed nodes were replaced by the restore
+        self.bedNodes = self.getBedNodeList()
+
     #switch to play mode (ball dropping mode)
     def gotoPlayMode(self):
         self.mode = "play"
-        self.buildEnviron = copy.deepcopy(self.environ)
+        self.buildSnapshot = self.environ.getSnapshot()
+        #lots of weights get dropped in play mode, so use the grid
+        self.environ.setBroadphase("grid")
         self.environ.start()
 
     #go to build mode with the terrain in the file at the given path
     def gotoBuildMode(self, path=None):
         self.mode = "build"
-        if(self.buildEnviron != None):
-            self.environ = self.buildEnviron
+        #checkpoints are only kept while testing
+        self.environ.stopCheckpoints()
+        if(path != None):
+            #a new level was picked, so the old build doesn't matter
+            self.buildSnapshot = None
+            self.initBuildMode(path)
+        elif(self.buildSnapshot != None):
+            self.environ.restoreSnapshot(self.buildSnapshot)
+            self.environ.renderAlpha = 1.0
+            self.environ.stepCount = 0
             #clear out ques
             self.undoQue = []
             self.redoQue = []
-        elif(path != None):
-            self.initBuildMode(path)
         else:
             raise Exception("no level to load D:")
         self.isGameOver = False
@@ -924,6 +942,8 @@ class PyBridge(EventBasedAnimationClass):
             self.gotoBuildMode()
         elif(event.keysym == "p"):
             self.environ.pause()
+        elif(event.keysym == "r"):
+            self.rewindTest()
 
     #undos a color change (color is what the obj origionally was) and returns
     #what should be added to the other que
@@ -1036,54 +1056,91 @@ class PyBridge(EventBasedAnimationClass):
             else:
                 self.fps = 1/(self.startTime - oldTime) 
 
+        self.handlePendingDrag()
         self.onTimerFired()
         self.redrawAll()
 
         self.canvas.after(self.timerDelay, self.onTimerFiredWrapper)
 
-    #write the new high score to the level file
+    #save the new high score (in the score journal, which writes it in the 
+    #background so the game doesn't wait for the file)
     def updateHighScore(self, newScore):
-        filePath = (self.levelFolder + os.sep + self.levelPrefix + 
-                    self.levelName + ".txt")
-        highScoreIndex = 3
-
-        contents = readFile(filePath)
-        contents = contents.splitlines()
-        #update high schore
-        self.highScore = self.score
-        contents[highScoreIndex] = str(self.highScore)
-        contents = "\n".join(contents)
-
-        writeFile(filePath, contents)
+        self.highScore = newScore
+        self.scoreJournal.record(self.levelName, newScore)
+
+    #advance the physics simulation by one step (self.dt)
+    def stepPhysics(self):
+        #add force to all bed Nodes if the game isn't over (and not while 
+        #paused, or the forces would pile up)
+        if(self.mode == "test" and self.environ.isSimulating):
+            step = self.environ.stepCount
+            if(step < len(self.testLoads)):
+                #replaying after a rewind
+                load = self.testLoads[step]
+            else:
+                load = 0 if self.isGameOver else self.testWeight
+                self.testLoads.append(load)
 
-    def onTimerFired(self):
-        if(self.mode in ["play", "start", "pick", "test"]):
-            #add force to all bed Nodes if the game isn't over
-            if(self.mode == "test" and not self.isGameOver):
-                nodeForce = -1*float(self.testWeight)/len(self.bedNodes)
+            if(load != 0):
+                nodeForce = -1*float(load)/len(self.bedNodes)
                 for node in self.bedNodes:
                     node.addForce(Vector(0, nodeForce))
 
-            #if any BridgeBed broke
-            isBroken = self.environ.update(self.dt, self.width, self.height)
-            
-            #if there was a BridgeBed that broke
-            if(isBroken and self.mode == "test"): 
-                self.isGameOver = True
-                if(self.score > self.highScore):
-                    self.gameOverText = "New High Score!"
-                    self.updateHighScore(self.score)
-                else:
-                    self.gameOverText = "Game Over"
+        #if any BridgeBed broke
+        isBroken = self.environ.update(self.dt, self.width, self.height)
+        
+        #if there was a BridgeBed that broke (only the first break counts)
+        if(isBroken and self.mode == "test" and not self.isGameOver): 
+            self.isGameOver = True
+            if(self.score > self.highScore):
+                self.gameOverText = "New High Score!"
+                self.updateHighScore(self.score)
+            else:
+                self.gameOverText = "Game Over"
+
+    #run as many physics steps as the time since the last frame needs, so 
+    #the simulation speed doesn't depend on how long drawing takes
+    def onTimerFired(self):
+        now = getTime()
+        #(clamp in case the clock went backwards)
+        elapsed = max(0, now - self.lastFrameTime)
+        self.lastFrameTime = now
+
+        if(self.mode in ["play", "start", "pick", "test"] and 
+           not self.environ.isSimulating):
+            #paused, so nothing is between steps (drawing part of the way 
+            #to a step that isn't coming would make the objects jitter)
+            self.timeAccumulator = 0
+            self.environ.renderAlpha = 1.0
+        elif(self.mode in ["play", "start", "pick", "test"]):
+            self.timeAccumulator += elapsed
+            steps = 0
+            while(self.timeAccumulator >= self.dt and 
+                  steps < self.maxStepsPerFrame):
+                self.stepPhysics()
+                self.timeAccumulator -= self.dt
+                steps += 1
+
+            #too far behind to catch up, so drop the extra time
+            if(self.timeAccumulator > self.dt):
+                self.timeAccumulator = self.dt
+
+            #draw the objects part of the way to their next position
+            self.environ.renderAlpha = self.timeAccumulator / self.dt
+        else:
+            self.timeAccumulator = 0
 
     #draw debug items
+    #(drawn behind the physics objects, which stay on the canvas between 
+    #frames)
     def drawDebug(self):
         #unit square for scale
         r = self.screenConversion
-        self.canvas.create_rectangle(0, 0, r, r, fill="red")
+        self.canvas.create_rectangle(0, 0, r, r, fill="red", tags="debugView")
         #frame rate
         self.canvas.create_text(0, 0, text=("%.2f" % self.fps), anchor=NW,
-                                font="Arial 20 bold")
+                                font="Arial 20 bold", tags="debugView")
+        self.canvas.tag_lower("debugView")
 
     def drawGameOver(self):
         (x, y) = (self.width/2, self.height/2)
@@ -1211,7 +1268,8 @@ class PyBridge(EventBasedAnimationClass):
                               self.normTextWeight)
         text = [("Help", title), 
                 ("Click \"Build\" to go back to build mode", norm), 
-                ("Click to add weight to the bridge bed", norm)]
+                ("Click to add weight to the bridge bed", norm),
+                ("Press \"r\" to rewind and watch it again", norm)]
 
         return text
 
@@ -1261,6 +1319,7 @@ class PyBridge(EventBasedAnimationClass):
 
     def drawGame(self):
         if(self.isHelpShown):
+            self.environ.clearDrawing(self.canvas)
             self.drawHelpScreen()
             return
         
@@ -1278,10 +1337,18 @@ class PyBridge(EventBasedAnimationClass):
         elif(self.mode == "test"):
             self.drawTestScreen()
 
+    #the physics objects keep their canvas items between frames (see 
+    #PhysEnvironment.draw), everything else is drawn again each frame
     def redrawAll(self):
-        self.canvas.delete(ALL)
+        if(self.environ is not self.drawnEnviron):
+            #the items are from an environment that was replaced
+            self.canvas.delete(ALL)
+            self.drawnEnviron = self.environ
+        else:
+            self.canvas.delete("!physics")
         if(self.debug): self.drawDebug()
         self.drawGame()
 
-demo = PyBridge(1250, 750)
-demo.run()
\ No newline at end of file
+if(__name__ == "__main__"):
+    demo = PyBridge(1250, 750)
+    demo.run()
\ No newline at end of file
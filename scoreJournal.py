@@ -0,0 +1,121 @@
+from levelFile import readFile
+import os
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+#keeps the high score of each level in an append-only journal file (one
+#"levelName<tab>score" line per new high score), so the level files never
+#have to be rewritten. The writes happen on a background thread so saving a
+#score never holds up the game, and once the journal has more than maxLines
+#lines it is compacted down to one line per level
+class ScoreJournal(object):
+    def __init__(self, path, maxLines=1000):
+        self.path = path
+        self.maxLines = maxLines
+        #level name -> best score (including ones not written yet)
+        self.highScores = dict()
+        #lines in the journal file
+        self.lineCount = 0
+        self.lock = threading.Lock()
+        self.load()
+
+        #(levelName, score) pairs waiting to be written, None to stop
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writeScores)
+        self.thread.daemon = True
+        self.thread.start()
+
+    #read the scores already in the journal
+    def load(self):
+        try:
+            text = readFile(self.path, "rb")
+        except IOError:
+            return
+
+        lines = text.split("\n")
+        if(lines[-1] != ""):
+            #the last line was being written when the game quit, so cut it 
+            #off (or the next score would be written onto the end of it)
+            with open(self.path, "r+") as fout:
+                fout.truncate(len(text) - len(lines[-1]))
+        #(the last line is either empty or was cut off)
+        for line in lines[:-1]:
+            parts = line.rsplit("\t", 1)
+            if(len(parts) != 2):
+                continue
+            (levelName, score) = parts
+            try:
+                score = int(score)
+            except ValueError:
+                continue
+            self.lineCount += 1
+            if(score > self.highScores.get(levelName, score - 1)):
+                self.highScores[levelName] = score
+
+    #the best score of the level (default if it doesn't have one)
+    def getHighScore(self, levelName, default=0):
+        with self.lock:
+            return self.highScores.get(levelName, default)
+
+    #save the score if it is the level's best so far. Returns right away,
+    #the journal is written to on the background thread
+    def record(self, levelName, score):
+        with self.lock:
+            if(levelName in self.highScores and
+               score <= self.highScores[levelName]):
+                return False
+            self.highScores[levelName] = score
+        self.queue.put((levelName, score))
+        return True
+
+    #runs on the background thread, writing scores as they are recorded
+    def writeScores(self):
+        while(True):
+            item = self.queue.get()
+            try:
+                if(item == None):
+                    return
+                self.appendScore(*item)
+            except (IOError, OSError):
+                #(losing a score is better than crashing the game)
+                pass
+            finally:
+                self.queue.task_done()
+
+    def appendScore(self, levelName, score):
+        with open(self.path, "a") as fout:
+            fout.write("%s\t%d\n" % (levelName, score))
+        self.lineCount += 1
+        if(self.lineCount > self.maxLines):
+            self.compact()
+
+    #rewrite the journal with just the best score of each level
+    def compact(self):
+        with self.lock:
+            highScores = dict(self.highScores)
+        lines = ["%s\t%d\n" % (levelName, highScores[levelName])
+                 for levelName in sorted(highScores)]
+
+        #write to a temporary file first so the journal is never half written
+        tempPath = self.path + ".tmp"
+        with open(tempPath, "w") as fout:
+            fout.write("".join(lines))
+        if(os.name == "nt" and os.path.exists(self.path)):
+            #(rename can't replace a file on windows)
+            os.remove(self.path)
+        os.rename(tempPath, self.path)
+        self.lineCount = len(lines)
+
+    #wait until every recorded score has been written
+    def flush(self):
+        self.queue.join()
+
+    #write the remaining scores and stop the background thread
+    def close(self):
+        if(self.thread.is_alive()):
+            self.queue.put(None)
+            self.thread.join()
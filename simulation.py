@@ -0,0 +1,206 @@
+from physics import *
+import levelFile
+import multiprocessing
+import sys
+
+#runs the test mode of the game (a bridge on a level with a growing load on
+#the bridge bed) without Tkinter, as fast as the physics can go
+
+class Simulation(object):
+    #set up the level at levelPath with the given bridge description (see
+    #levelFile.getBridgeInfo) on it. width and height are the size of the
+    #screen (in pixels) the level was made for. levelInfo is the result of
+    #levelFile.getLevelInfo(levelPath) if it has already been read
+    def __init__(self, levelPath, bridge, width=1250, height=750, 
+                 levelInfo=None):
+        self.width = width
+        self.height = height
+
+        #same constants as the game
+        self.screenConversion = 50 #pixels/meter
+        self.gravity = 5 #m/s**2
+        self.nodeMass = 10 #kg
+        self.breakRatio = 0.05
+        self.dt = 1/30.0 #seconds
+
+        #how much the load goes up and how often (the load is the total
+        #force on the bed nodes, like testWeight in the game)
+        self.loadIncrement = 250
+        self.stepsPerIncrement = 30
+
+        self.environ = PhysEnvironment(self.gravity, self.screenConversion,
+                                       0, self.height)
+        self.levelName = levelFile.getLevelName(levelPath)
+        if(levelInfo == None):
+            levelInfo = levelFile.getLevelInfo(levelPath)
+        self.startNodes = self.prepareLevel(*levelInfo)
+        self.bridgeConstraints = self.placeBridge(*bridge)
+        self.bedNodes = self.getBedNodeList()
+
+        self.steps = 0
+        self.load = 0
+        #step the first BridgeBed broke on and the load at the time
+        self.breakStep = None
+        self.breakLoad = None
+        #largest |lenRatio| of any bridge constraint so far
+        self.peakRatio = 0
+
+        self.environ.start()
+
+    #add the terrain of the level to the environment (like
+    #PyBridge.prepareLevel) and return the start nodes in order
+    def prepareLevel(self, nodePoints, constraintIndexes,startNodes,highScore):
+        self.highScore = int(highScore)
+
+        nodes = []
+        for (x, y) in nodePoints:
+            nodes.append(Node(Vector(x, y), self.nodeMass, self.environ, True,
+                              False))
+
+        for (node1Index, node2Index) in constraintIndexes:
+            LandBeam(nodes[node1Index], nodes[node2Index], self.breakRatio,
+                     self.environ)
+
+        for index in startNodes:
+            nodes[index].visible = True
+
+        return [nodes[index] for index in startNodes]
+
+    #add the bridge's nodes and constraints and return the constraints
+    def placeBridge(self, nodePoints, bedIndexes, beamIndexes):
+        nodes = list(self.startNodes)
+        for (x, y) in nodePoints:
+            nodes.append(Node(Vector(x, y), self.nodeMass, self.environ,
+                              False, True))
+
+        constraints = []
+        for (node1Index, node2Index) in bedIndexes:
+            constraints.append(BridgeBed(nodes[node1Index], nodes[node2Index],
+                                         self.breakRatio, self.environ))
+        for (node1Index, node2Index) in beamIndexes:
+            constraints.append(BridgeBeam(nodes[node1Index],nodes[node2Index],
+                                          self.breakRatio, self.environ))
+
+        return constraints
+
+    #all free nodes connected to a BridgeBed (the nodes the load goes on)
+    def getBedNodeList(self):
+        bedNodes = []
+        for obj in self.environ.objects:
+            if(isinstance(obj, Node) and not obj.isFixed):
+                for beam in obj.constraints:
+                    if(isinstance(beam, BridgeBed)):
+                        bedNodes.append(obj)
+                        break
+
+        return bedNodes
+
+    #true if the bridge reaches across the gap (test mode can only be
+    #started if this is true)
+    def spansGap(self):
+        return self.environ.doesBridgeCover(self.width)
+
+    #advance one step, putting the current load on the bed nodes. Returns
+    #true if a BridgeBed broke in this step
+    def step(self):
+        if(self.breakStep == None and len(self.bedNodes) > 0):
+            nodeForce = -1*float(self.load)/len(self.bedNodes)
+            for node in self.bedNodes:
+                node.addForce(Vector(0, nodeForce))
+
+        isBroken = self.environ.update(self.dt, self.width, self.height)
+        self.steps += 1
+
+        for constraint in self.bridgeConstraints:
+            if(abs(constraint.lenRatio) > self.peakRatio):
+                self.peakRatio = abs(constraint.lenRatio)
+
+        if(isBroken and self.breakStep == None):
+            self.breakStep = self.steps
+            self.breakLoad = self.load
+
+        #the load goes up like clicks in test mode
+        if(self.steps % self.stepsPerIncrement == 0):
+            self.load += self.loadIncrement
+
+        return isBroken
+
+    #step until a BridgeBed breaks or maxSteps steps have run
+    def run(self, maxSteps=3000):
+        while(self.breakStep == None and self.steps < maxSteps):
+            self.step()
+        return self.getResults()
+
+    #the results so far as a dictionary. score is the load when the bed
+    #broke (what the game would score) or None if it hasn't broken
+    def getResults(self):
+        return {"level": self.levelName,
+                "steps": self.steps,
+                "broke": self.breakStep != None,
+                "breakStep": self.breakStep,
+                "breakTime": (None if self.breakStep == None
+                              else self.breakStep * self.dt),
+                "score": self.breakLoad,
+                "peakRatio": self.peakRatio}
+
+#test one bridge on a level and return the results (see getResults). 
+#Bridges that don't span the gap aren't run; "spans" says which is which
+def evaluateBridge(levelPath, bridge, maxSteps=3000, levelInfo=None):
+    simulation = Simulation(levelPath, bridge, levelInfo=levelInfo)
+    spans = simulation.spansGap()
+    if(spans):
+        results = simulation.run(maxSteps)
+    else:
+        results = simulation.getResults()
+    results["spans"] = spans
+    return results
+
+#the (level path, level info, max steps) each batch worker uses, set once
+#per worker process by initWorker so the level is only read once
+workerLevel = None
+
+def initWorker(levelPath, maxSteps):
+    global workerLevel
+    workerLevel = (levelPath, levelFile.getLevelInfo(levelPath), maxSteps)
+
+def evaluateWorker(bridge):
+    (levelPath, levelInfo, maxSteps) = workerLevel
+    return evaluateBridge(levelPath, bridge, maxSteps, levelInfo)
+
+#test every bridge in bridges on the level at levelPath, spread over
+#processes worker processes (one per core by default). Returns the list of
+#results in the same order as bridges
+def evaluateDesigns(levelPath, bridges, processes=None, maxSteps=3000):
+    if(processes == None):
+        processes = multiprocessing.cpu_count()
+
+    #no point starting other processes for one worker
+    if(processes == 1 or len(bridges) <= 1):
+        levelInfo = levelFile.getLevelInfo(levelPath)
+        return [evaluateBridge(levelPath, bridge, maxSteps, levelInfo) 
+                for bridge in bridges]
+
+    pool = multiprocessing.Pool(processes, initWorker, (levelPath, maxSteps))
+    try:
+        #hand out a few bridges at a time so the workers stay busy without 
+        #paying for a round trip per bridge
+        chunkSize = max(1, len(bridges) / (4 * processes))
+        return pool.map(evaluateWorker, bridges, chunkSize)
+    finally:
+        pool.close()
+        pool.join()
+
+#run bridge files on a level file from the command line:
+#   python simulation.py "levels/level_Level 1.txt" bridge1.txt bridge2.txt
+if(__name__ == "__main__"):
+    if(len(sys.argv) < 3):
+        print "usage: python simulation.py levelFile bridgeFile..."
+        sys.exit(1)
+    bridgePaths = sys.argv[2:]
+    bridges = [levelFile.getBridgeInfo(path) for path in bridgePaths]
+    allResults = evaluateDesigns(sys.argv[1], bridges)
+    for i in xrange(len(bridgePaths)):
+        print bridgePaths[i]
+        results = allResults[i]
+        for key in sorted(results):
+            print "    %s: %s" % (key, results[key])
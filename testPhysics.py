@@ -1,4 +1,14 @@
 from physics import *
+import copy
+import math
+import random
+import os
+import tempfile
+import shutil
+import atexit
+import levelFile
+from simulation import Simulation, evaluateDesigns
+from scoreJournal import ScoreJournal
 from pyBridge import PyBridge
 
 def testVectorClass():
@@ -63,6 +73,611 @@ def testPhysEnvironmentClass():
     assert(environment.getVect(150, 175) == Vector(1.5, .75))
     print "...Passed!"
 
+def testParticleStore():
+    print "Testing ParticleStore...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    node1 = Node(Vector(1, 2), 10, environ, True)
+    node2 = Node(Vector(3, 4), 10, environ, False)
+    weight = Weight(Vector(5, 6), 20, environ)
+
+    assert(len(environ.particles) == 3)
+    assert(node2.position == Vector(3, 4))
+    assert(node2.oldPosition == None)
+
+    #views write through to the store
+    node2.position += Vector(1, 1)
+    assert(environ.particles.x[node2.particleIndex] == 4)
+    weight.addForce(Vector(0, 5))
+    assert(weight.force == Vector(0, 5))
+
+    #removing a particle moves the last slot into its place
+    node1.delete()
+    assert(len(environ.particles) == 2)
+    assert(weight.particleIndex == 0)
+    assert(weight.position == Vector(5, 6))
+    assert(node1.position == Vector(1, 2))
+
+    #objects keep their state while removed from the environment
+    environ.add(node1)
+    assert(node1.particleIndex == 2)
+    assert(node1.position == Vector(1, 2))
+    print "...passed!"
+
+#the old way of moving one free object forward a step with verlet
+#integration, straight through the object
+def updateObject(obj, dt):
+    particles = obj.environ.particles
+    i = obj.particleIndex
+
+    #acceleration from the added forces and gravity
+    invMass = particles.invMass[i]
+    accelX = particles.forceX[i] * invMass
+    accelY = (particles.forceY[i] - obj.environ.gravity * obj.mass) * invMass
+
+    (x, y) = (particles.x[i], particles.y[i])
+    if(not particles.hasOld[i]):
+        #x' = x + (1/2)*a*dt**2 (starting from rest)
+        newX = x + 0.5 * accelX * dt**2
+        newY = y + 0.5 * accelY * dt**2
+    else:
+        #x' = 2*x - oldX + a*dt**2
+        newX = 2 * x - particles.oldX[i] + accelX * dt**2
+        newY = 2 * y - particles.oldY[i] + accelY * dt**2
+
+    (particles.oldX[i], particles.oldY[i]) = (x, y)
+    particles.hasOld[i] = 1
+    (particles.x[i], particles.y[i]) = (newX, newY)
+    (particles.forceX[i], particles.forceY[i]) = (0.0, 0.0)
+
+def testIntegrate():
+    print "Testing PhysEnvironment.integrate...",
+    dt = 0.1
+    environ = PhysEnvironment(10, 100, 0, 250)
+    fixed = Node(Vector(0, 0), 10, environ, True)
+    free = Node(Vector(1, 0), 10, environ, False)
+    loaded = Node(Vector(2, 0), 10, environ, False)
+
+    #the batched step should match stepping each object on its own
+    other = PhysEnvironment(10, 100, 0, 250)
+    single = Node(Vector(2, 0), 10, other, False)
+
+    for step in xrange(3):
+        loaded.addForce(Vector(50, 0))
+        single.addForce(Vector(50, 0))
+        environ.integrate(dt)
+        updateObject(single, dt)
+
+    assert(fixed.position == Vector(0, 0))
+    #first step is x + (1/2)*a*dt**2, then verlet
+    assert(free.position == Vector(1, -10*(0.5 + 1.5 + 2.5)*dt**2))
+    assert(loaded.position == single.position)
+    assert(loaded.force == Vector(0, 0))
+    print "...passed!"
+
+def testConstraintSolver():
+    print "Testing ConstraintSolver...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(0, 0), 10, environ, True)]
+    for i in xrange(1, 6):
+        nodes.append(Node(Vector(i, 0), 10, environ, False))
+    beams = [BridgeBeam(nodes[i], nodes[i+1], 0.05, environ) 
+             for i in xrange(5)]
+    beams.append(BridgeBeam(nodes[1], nodes[3], 0.05, environ))
+
+    #stretch the chain and let the solver pull it back
+    for i in xrange(1, 6):
+        nodes[i].position = Vector(i * 1.2, 0.3 * i)
+    for iteration in xrange(200):
+        environ.solver.resolve()
+    for beam in beams:
+        assert(abs(beam.getLength() - beam.restLen) < 10**-6)
+    assert(nodes[0].position == Vector(0, 0))
+
+    #one pass moves the nodes exactly like resolving the constraints one at 
+    #a time in the order they were made
+    for i in xrange(1, 6):
+        nodes[i].position = Vector(i * 1.2, 0.3 * i)
+    other = copy.deepcopy(environ)
+    environ.solver.resolve()
+    for index in other.constraintIndexes:
+        resolveConstraint(other.objects[index])
+    for index in environ.otherIndexes:
+        assert(environ.objects[index].position == 
+               other.objects[index].position)
+    print "...passed!"
+
+#the old way of resolving a constraint: move both ends half of the way to 
+#the rest length, straight through the objects
+def resolveConstraint(constraint):
+    constraint.updateInfo()
+    shift = constraint.nodeVect * 0.5 * constraint.lenRatio
+    if(not constraint.nodes[0].isFixed):
+        constraint.nodes[0].position += shift
+    if(not constraint.nodes[1].isFixed):
+        constraint.nodes[1].position -= shift
+
+#the old relaxation loop, resolving each constraint on its own
+def resolveSequentially(environ):
+    environ.lastIterations = 0
+    for iteration in xrange(environ.resolveIterations):
+        environ.resolveCollisions()
+        for index in environ.constraintIndexes:
+            resolveConstraint(environ.objects[index])
+        environ.lastIterations += 1
+
+#a truss between start nodes a and b of a level: a bed split into segments 
+#with a triangle of beams standing on each segment
+def getTrussBridge(path, a, b, segments):
+    (points, constraints, startNodes, highScore) = levelFile.getLevelInfo(path)
+    ((ax, ay), (bx, by)) = (points[startNodes[a]], points[startNodes[b]])
+    (nodes, beds, beams) = ([], [], [])
+    bed = [a]
+    for k in xrange(1, segments):
+        nodes.append((ax + (bx - ax)*k/segments, ay + (by - ay)*k/segments))
+        bed.append(len(startNodes) + len(nodes) - 1)
+    bed.append(b)
+    tops = []
+    for k in xrange(segments):
+        t = (k + 0.5) / segments
+        nodes.append((ax + (bx - ax)*t, ay + (by - ay)*t + 1.5))
+        tops.append(len(startNodes) + len(nodes) - 1)
+    for k in xrange(segments):
+        beds.append((bed[k], bed[k+1]))
+        beams += [(bed[k], tops[k]), (tops[k], bed[k+1])]
+        if(k + 1 < segments):
+            beams.append((tops[k], tops[k+1]))
+    return (nodes, beds, beams)
+
+def testSequentialResolve():
+    print "Testing solver against sequential resolving...",
+    #the solver has to break bridges at the same step with the same score 
+    #as the old loop on every shipped level
+    for level in xrange(1, 5):
+        path = "levels" + os.sep + "level_Level %d.txt" % level
+        bridge = getTrussBridge(path, 0, 3, 3)
+        simulation = Simulation(path, bridge)
+        old = Simulation(path, bridge)
+        old.environ.resolveCollisionsConstraints = (lambda environ=
+            old.environ: resolveSequentially(environ))
+        assert(simulation.spansGap())
+        results = simulation.run(600)
+        oldResults = old.run(600)
+        assert(results["broke"])
+        assert(results["breakStep"] == oldResults["breakStep"])
+        assert(results["score"] == oldResults["score"])
+    print "...passed!"
+
+#the edges of every weight and constraint in the form (xval, index, 
+#"R"/"L"), sorted
+def getEdgeList(environ):
+    edgeList = []
+    for obj in environ.objects:
+        if(isinstance(obj, Weight) or isinstance(obj, Constraint)):
+            (xLeft, xRight) = obj.getXBounds()
+            edgeList += [(xLeft, obj.environIndex, "L"), 
+                         (xRight, obj.environIndex, "R")]
+    edgeList.sort()
+    return edgeList
+
+#the pairs found by sweeping over a freshly sorted edge list
+def getSweepPairs(environ):
+    pairs = []
+    objList = []
+    for (x, i, side) in getEdgeList(environ):
+        obj = environ.objects[i]
+        if(side == "L"):
+            for other in objList:
+                if(isinstance(obj, Weight)):
+                    pairs.append((obj, other))
+                elif(isinstance(other, Weight)):
+                    pairs.append((other, obj))
+            objList.append(obj)
+        else:
+            objList.remove(obj)
+    return pairs
+
+def testSweepAndPrune():
+    print "Testing SweepAndPrune...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, i % 2), 10, environ, False) for i in xrange(6)]
+    for i in xrange(5):
+        BridgeBed(nodes[i], nodes[i+1], 0.05, environ)
+    weights = [Weight(Vector(0.5 + i * 0.7, 2), 10, environ) 
+               for i in xrange(6)]
+    assert(environ.broadphase.getPairs() == getSweepPairs(environ))
+
+    #move things around and remove some objects
+    for i in xrange(6):
+        weights[i].position = Vector(5 - i * 0.9, 2)
+    weights[2].delete()
+    nodes[3].delete()
+    Weight(Vector(2.2, 3), 10, environ)
+    assert(environ.broadphase.getPairs() == getSweepPairs(environ))
+    print "...passed!"
+
+#the (weight, constraint) pairs found by checking every cell in each 
+#constraint's bounding box (in the order SpatialHash.getPairs finds them)
+def getBoxPairs(environ):
+    grid = environ.broadphase
+    (x, y) = (environ.particles.x, environ.particles.y)
+    cellSize = 2 * grid.maxRadius
+    cells = dict()
+    for index in environ.weightIndexes:
+        weight = environ.objects[index]
+        i = weight.particleIndex
+        cell = (int(math.floor(x[i] / cellSize)), 
+                int(math.floor(y[i] / cellSize)))
+        cells[cell] = cells.get(cell, []) + [weight]
+
+    pairs = []
+    for index in environ.constraintIndexes:
+        constraint = environ.objects[index]
+        if(not constraint.isCollidable):
+            continue
+        (i, j) = [node.particleIndex for node in constraint.nodes]
+        margin = (grid.maxRadius + 
+                  environ.getEnvironScalar(constraint.width/2))
+        for cellX in xrange(int(math.floor((min(x[i], x[j]) - margin) / 
+                                           cellSize)),
+                            int(math.floor((max(x[i], x[j]) + margin) / 
+                                           cellSize)) + 1):
+            for cellY in xrange(int(math.floor((min(y[i], y[j]) - margin) / 
+                                               cellSize)),
+                                int(math.floor((max(y[i], y[j]) + margin) / 
+                                               cellSize)) + 1):
+                for weight in cells.get((cellX, cellY), []):
+                    pairs.append((weight, constraint))
+    return pairs
+
+def testSpatialHash():
+    print "Testing SpatialHash...",
+    environ = PhysEnvironment(10, 100, 0, 250, "grid")
+    node1 = Node(Vector(0, 0), 10, environ, True)
+    node2 = Node(Vector(4, 1), 10, environ, True)
+    land = LandBeam(node1, node2, 0.05, environ)
+    BridgeBeam(node1, node2, 0.05, environ)
+    weights = [Weight(Vector(1 + (i % 7) * 0.25, (i / 7) * 0.25), 10, environ)
+               for i in xrange(35)]
+    weights[3].delete()
+    del weights[3]
+
+    pairs = set((id(a), id(b)) for (a, b) in environ.broadphase.getPairs())
+    #every pair of touching weights is found (in one order or the other)
+    minDist = 2 * environ.getEnvironScalar(weights[0].r)
+    for a in weights:
+        for b in weights:
+            if(a is not b and (a.position - b.position).getMag() < minDist):
+                assert((id(a), id(b)) in pairs or (id(b), id(a)) in pairs)
+    #weights touching the land are paired with it
+    for weight in weights:
+        if(weight.position.y < 0.5):
+            assert((id(weight), id(land)) in pairs)
+    assert(len(pairs) < 35 * 34 / 2)
+
+    #a long diagonal beam with a few weights gives the same pairs
+    far = Node(Vector(40, 30), 10, environ, True)
+    LandBeam(node1, far, 0.05, environ)
+    pairs = environ.broadphase.getPairs()
+    constraintPairs = [pair for pair in pairs 
+                       if isinstance(pair[1], Constraint)]
+    assert(constraintPairs == getBoxPairs(environ))
+
+    #switching broadphase keeps the tracked objects
+    environ.setBroadphase("sweep")
+    assert(environ.broadphase.getPairs() == getSweepPairs(environ))
+    print "...passed!"
+
+def testDeleteObj():
+    print "Testing PhysEnvironment.deleteObj...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, 0), 10, environ, False) for i in xrange(5)]
+    beams = [BridgeBeam(nodes[i], nodes[i+1], 0.05, environ) 
+             for i in xrange(4)]
+    weights = [Weight(Vector(i, 3), 10, environ) for i in xrange(5)]
+
+    environ.deleteObjs([weights[0], weights[3]])
+    nodes[2].delete()
+    beams[0].delete()
+
+    #every object knows where it is and is in the right index list
+    assert(len(environ.objects) == 4 + 1 + 3)
+    for i in xrange(len(environ.objects)):
+        obj = environ.objects[i]
+        assert(obj.environIndex == i)
+        indexList = environ.getIndexList(obj)
+        assert(indexList[obj.indexListIndex] == i)
+    assert(sorted(environ.weightIndexes + environ.constraintIndexes + 
+                  environ.otherIndexes) == range(len(environ.objects)))
+    assert(len(environ.weightIndexes) == 3)
+    assert(len(environ.constraintIndexes) == 1)
+    print "...passed!"
+
+#the node a scan through otherIndexes finds (what getClickedObj used to do)
+def getScannedClick(environ, x, y):
+    for index in environ.otherIndexes:
+        if(environ.objects[index].isClicked(x, y)):
+            return environ.objects[index]
+    return None
+
+def testNodeGrid():
+    print "Testing NodeGrid...",
+    environ = PhysEnvironment(10, 50, 0, 500)
+    rand = random.Random(15112)
+    nodes = [Node(Vector(rand.uniform(0, 10), rand.uniform(0, 10)), 10, 
+                  environ, i % 3 == 0, i % 5 != 0) for i in xrange(200)]
+    for i in xrange(0, 150, 2):
+        BridgeBeam(nodes[i], nodes[i+1], 0.05, environ)
+    #some overlapping nodes
+    for i in xrange(5):
+        Node(nodes[i * 10 + 1].position, 10, environ, True)
+
+    def checkClicks():
+        for i in xrange(300):
+            (x, y) = (rand.uniform(0, 500), rand.uniform(0, 500))
+            clicked = environ.getClickedObj(x, y)
+            assert(clicked is getScannedClick(environ, x, y))
+        for node in nodes[:20]:
+            (x, y) = node.getScreenXY()
+            clicked = environ.getClickedObj(x + 3, y - 3)
+            assert(clicked is getScannedClick(environ, x + 3, y - 3))
+
+    checkClicks()
+    #moving and deleting nodes (and changing the order of otherIndexes)
+    for i in xrange(40):
+        nodes[i].position = Vector(rand.uniform(0, 10), rand.uniform(0, 10))
+    for i in xrange(40, 60):
+        nodes[i].delete()
+    checkClicks()
+    environ.origin = Vector(30, 480)
+    checkClicks()
+    environ.start()
+    for i in xrange(5):
+        environ.update(1/30.0, 500, 500)
+    environ.renderAlpha = 0.5
+    checkClicks()
+    print "...passed!"
+
+def testDoesBridgeCover():
+    print "Testing PhysEnvironment.doesBridgeCover...",
+    #screen is 5m wide
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(-1 + i * 1.3, 1), 10, environ, False) 
+             for i in xrange(6)]
+    for i in xrange(4):
+        BridgeBed(nodes[i], nodes[i+1], 0.05, environ)
+    #non-collidable beams don't count
+    beam = BridgeBeam(nodes[4], nodes[5], 0.05, environ)
+    assert(not environ.doesBridgeCover(500))
+
+    bed = BridgeBed(nodes[4], nodes[5], 0.05, environ)
+    assert(environ.doesBridgeCover(500))
+
+    #moving the end node back onto the screen breaks the span
+    nodes[5].position = Vector(4.5, 1)
+    assert(not environ.doesBridgeCover(500))
+    nodes[5].position = Vector(6, 1)
+    assert(environ.doesBridgeCover(500))
+
+    #copies keep working
+    copied = copy.deepcopy(environ)
+    assert(copied.doesBridgeCover(500))
+
+    bed.delete()
+    assert(not environ.doesBridgeCover(500))
+    print "...passed!"
+
+#the old way of fixing the collision between a weight and a collidable 
+#constraint, straight through the objects
+def fixWeightConstraintCollision(weight, constraint):
+    environ = weight.environ
+    minDist = (environ.getEnvironScalar(weight.r) +
+               environ.getEnvironScalar(constraint.width/2))
+    (node1, node2) = (constraint.nodes[0], constraint.nodes[1])
+    nodeWeightVect = weight.position - node1.position
+    otherNodeWeightVect = weight.position - node2.position
+    constraintVect = node2.position - node1.position
+
+    #only if the weight is over the constraint
+    if(nodeWeightVect.getCosTheta(constraintVect) > 0 and 
+       otherNodeWeightVect.getCosTheta(constraintVect * -1) > 0):
+        #vector perpendicular to constraint to center of ball
+        perpVect = nodeWeightVect.projOnto(constraintVect) - nodeWeightVect
+        dist = perpVect.getMag()
+        if(dist < minDist):
+            scaleFactor = (dist - minDist) / dist
+            weight.position += perpVect*weight.collisionRatio*scaleFactor
+            constraintRatio = 1 - weight.collisionRatio
+            if(not node1.isFixed):
+                node1.position -= perpVect*constraintRatio*scaleFactor
+            if(not node2.isFixed):
+                node2.position -= perpVect*constraintRatio*scaleFactor
+
+#the old way of fixing the collision between two weights
+def fixWeightWeightCollision(weight, otherWeight):
+    environ = weight.environ
+    centerVect = otherWeight.position - weight.position
+    dist = centerVect.getMag()
+    minDist = (environ.getEnvironScalar(otherWeight.r) + 
+               environ.getEnvironScalar(weight.r))
+    if(dist < minDist):
+        scaleFactor = (dist - minDist) / dist
+        weight.position += centerVect*(1/2.0)*scaleFactor
+        otherWeight.position -= centerVect*(1/2.0)*scaleFactor
+
+def testFixCollisionPairs():
+    print "Testing PhysEnvironment.fixCollisionPairs...",
+    #build the same scene twice and fix it with both methods
+    environs = []
+    for copyIndex in xrange(2):
+        environ = PhysEnvironment(10, 100, 0, 250)
+        node1 = Node(Vector(0, 0), 10, environ, True)
+        node2 = Node(Vector(2, 0.5), 10, environ, False)
+        bed = BridgeBed(node1, node2, 0.05, environ)
+        weights = [Weight(Vector(0.3 + 0.2 * i, 0.2 + 0.1 * (i % 3)), 10, 
+                          environ) for i in xrange(8)]
+        pairs = [(weights[i], bed) for i in xrange(8)]
+        pairs += [(weights[i], weights[i-1]) for i in xrange(1, 8)]
+        environs.append((environ, pairs))
+
+    (environ, pairs) = environs[0]
+    environ.fixCollisionPairs(pairs)
+    (other, otherPairs) = environs[1]
+    for (weight, obj) in otherPairs:
+        if(isinstance(obj, Weight)):
+            fixWeightWeightCollision(weight, obj)
+        elif(obj.isCollidable):
+            fixWeightConstraintCollision(weight, obj)
+
+    for i in xrange(len(environ.objects)):
+        if(isinstance(environ.objects[i], PhysObject)):
+            assert(environ.objects[i].position == other.objects[i].position)
+    print "...passed!"
+
+def testIslands():
+    print "Testing Islands...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(0, 0), 10, environ, True), 
+             Node(Vector(1, 0), 10, environ, False),
+             Node(Vector(2, 0), 10, environ, True),
+             Node(Vector(5, 0), 10, environ, True),
+             Node(Vector(6, 0), 10, environ, False)]
+    BridgeBed(nodes[0], nodes[1], 0.5, environ)
+    BridgeBed(nodes[1], nodes[2], 0.5, environ)
+    BridgeBeam(nodes[3], nodes[4], 0.5, environ)
+    environ.start()
+
+    #the hanging beam keeps swinging, the tight bed settles right away
+    for step in xrange(100):
+        environ.update(1/30.0, 1000, 1000)
+    assert(environ.particles.asleep[nodes[1].particleIndex])
+    assert(not environ.particles.asleep[nodes[4].particleIndex])
+    assert(not environ.particles.isIdle())
+
+    #a sleeping island doesn't move and wakes up when a load is added
+    position = nodes[1].position
+    environ.update(1/30.0, 1000, 1000)
+    assert(nodes[1].position == position)
+    nodes[1].addForce(Vector(0, -100))
+    assert(not environ.particles.asleep[nodes[1].particleIndex])
+    environ.update(1/30.0, 1000, 1000)
+    assert(nodes[1].position != position)
+
+    #deleting a node while its island sleeps wakes everything up (and the
+    #out of date islands aren't used until they are rebuilt)
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, 0), 10, environ, i in [0, 3]) for i in xrange(4)]
+    for i in xrange(3):
+        BridgeBed(nodes[i], nodes[i+1], 0.5, environ)
+    environ.start()
+    for step in xrange(100):
+        environ.update(1/30.0, 1000, 1000)
+    assert(environ.particles.isIdle())
+    position = nodes[2].position
+    nodes[1].delete()
+    nodes[2].addForce(Vector(0, -100))
+    assert(environ.particles.asleepCount == 0)
+    environ.update(1/30.0, 1000, 1000)
+    assert(nodes[2].position != position)
+
+    #deleting a constraint only wakes the islands of its nodes, the others 
+    #keep sleeping through the rebuild
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, 0), 10, environ, i in [0, 2, 3, 6]) 
+             for i in xrange(7)]
+    beds = [BridgeBed(nodes[i], nodes[i+1], 0.5, environ) 
+            for i in xrange(6) if i != 2]
+    environ.start()
+    for step in xrange(100):
+        environ.update(1/30.0, 1000, 1000)
+    assert(environ.particles.isIdle())
+    beds[-1].delete()
+    asleep = environ.particles.asleep
+    assert(asleep[nodes[1].particleIndex])
+    assert(not asleep[nodes[4].particleIndex])
+    assert(not asleep[nodes[5].particleIndex])
+    environ.update(1/30.0, 1000, 1000)
+    assert(asleep[nodes[1].particleIndex])
+    assert(environ.particles.asleepCount == 1)
+
+    #a sleeping island can still be woken before the rebuild
+    beds[2].delete()
+    nodes[1].addForce(Vector(0, -100))
+    assert(environ.particles.asleepCount == 0)
+    print "...passed!"
+
+def testGetDrawPosition():
+    print "Testing PhysObject.getDrawPosition...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    fixed = Node(Vector(0, 0), 10, environ, True)
+    weight = Weight(Vector(3, 0), 10, environ)
+    environ.start()
+
+    #before a step (or with alpha 1) the current position is drawn
+    assert(weight.getDrawPosition() == weight.position)
+    environ.update(1/30.0, 1000, 1000)
+    environ.renderAlpha = 1.0
+    assert(weight.getDrawPosition() == weight.position)
+
+    #part way between steps draws part way between the positions
+    environ.renderAlpha = 0.5
+    halfway = (weight.oldPosition + weight.position) / 2.0
+    assert(weight.getDrawPosition() == halfway)
+    assert(fixed.getDrawPosition() == fixed.position)
+    print "...passed!"
+
+def testScreenCoords():
+    print "Testing PhysEnvironment.getScreenCoords...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, 1), 10, environ, i == 0) for i in xrange(3)]
+    weight = Weight(Vector(1, 2), 10, environ)
+    environ.start()
+    environ.update(1/30.0, 1000, 1000)
+
+    #the batch matches transforming each draw position on its own
+    for alpha in [1.0, 0.25]:
+        environ.renderAlpha = alpha
+        for obj in nodes + [weight]:
+            screenXY = environ.getScreenXY(obj.getDrawPosition())
+            assert(obj.getScreenXY() == screenXY)
+
+    #kept until something moves or the view changes
+    coords = environ.getScreenCoords()
+    assert(environ.getScreenCoords() is coords)
+    nodes[1].position = Vector(1, 0)
+    assert(environ.getScreenCoords() is not coords)
+    environ.renderAlpha = 1.0
+    assert(nodes[1].getScreenXY() == (100, 250))
+    environ.origin = Vector(50, 250)
+    assert(nodes[1].getScreenXY() == (150, 250))
+    environ.screenConversion = 10
+    assert(nodes[1].getScreenXY() == (60, 250))
+    assert(nodes[1].isClicked(60, 255) and not nodes[1].isClicked(100, 250))
+    print "...passed!"
+
+def testAdaptiveIterations():
+    print "Testing PhysEnvironment.resolveCollisionsConstraints...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(0, 0), 10, environ, True), 
+             Node(Vector(1, 0), 10, environ, False),
+             Node(Vector(2, 0), 10, environ, True)]
+    BridgeBed(nodes[0], nodes[1], 0.5, environ)
+    BridgeBed(nodes[1], nodes[2], 0.5, environ)
+    environ.start()
+
+    #a stretched constraint uses every pass, but stops at the ceiling
+    nodes[1].position = Vector(1.3, 0)
+    environ.resolveCollisionsConstraints()
+    assert(environ.lastIterations == environ.resolveIterations)
+
+    #once it is within tolerance one pass is enough
+    for i in xrange(50):
+        environ.resolveCollisionsConstraints()
+    assert(environ.lastIterations == 1)
+    environ.resolveIterations = 0
+    environ.resolveCollisionsConstraints()
+    assert(environ.lastIterations == 0)
+    print "...passed!"
+
 def testTextToList():
     print "Testing textToList...",
     c = PyBridge()
@@ -72,7 +687,556 @@ def testTextToList():
     assert(c.textToList(text) == eval(text))
     print "...passed!"
 
+def testCoalescedDrags():
+    print "Testing coalesced drags...",
+    c = PyBridge()
+    c.pendingDrag = None
+    handled = []
+    c.onMouseDrag = lambda event: handled.append(("drag", event))
+    c.onMouseReleased = lambda event: handled.append(("release", event))
+
+    #only the latest drag is handled, and not until it is asked for
+    for x in xrange(10):
+        c.onMouseDragWrapper(x)
+    assert(handled == [])
+    c.handlePendingDrag()
+    c.handlePendingDrag()
+    assert(handled == [("drag", 9)])
+
+    #a release handles the drag before it first
+    c.onMouseDragWrapper(11)
+    c.onMouseReleasedWrapper(12)
+    assert(handled[1:] == [("drag", 11), ("release", 12)])
+    print "...passed!"
+
+def testTestModeCheckpoints():
+    print "Testing test mode checkpoints...",
+    c = PyBridge()
+    c.rewindSteps = 20
+    c.environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, 0), 10, c.environ, i % 2 == 0) 
+             for i in xrange(3)]
+    BridgeBed(nodes[0], nodes[1], 0.05, c.environ)
+    BridgeBed(nodes[1], nodes[2], 0.05, c.environ)
+    c.buildSnapshot = c.environ.getSnapshot()
+    c.environ.start()
+    c.environ.startCheckpoints(10, 5)
+    for i in xrange(35):
+        c.environ.update(1/30.0, 1000, 1000)
+
+    #rewinding a paused test leaves it paused
+    c.environ.pause()
+    c.rewindTest()
+    assert(c.environ.stepCount == 10 and not c.environ.isSimulating)
+
+    #leaving test mode stops the checkpoints
+    c.gotoBuildMode()
+    assert(c.environ.checkpoints == None and c.environ.stepCount == 0)
+    print "...passed!"
+
+def testPausedFrames():
+    print "Testing paused frames...",
+    c = PyBridge()
+    (c.mode, c.dt, c.maxStepsPerFrame) = ("test", 1/30.0, 5)
+    c.environ = PhysEnvironment(10, 100, 0, 250)
+    Node(Vector(0, 0), 10, c.environ, False)
+    c.environ.start()
+    c.environ.pause()
+
+    #a paused frame draws the objects where they are instead of part of the 
+    #way to a step that won't happen
+    (c.timeAccumulator, c.lastFrameTime) = (0.02, 0)
+    c.environ.renderAlpha = 0.6
+    c.onTimerFired()
+    assert(c.timeAccumulator == 0 and c.environ.renderAlpha == 1)
+    assert(c.environ.stepCount == 0)
+    print "...passed!"
+
+def testGameConstants():
+    print "Testing PyBridge.initGameConstants...",
+    c = PyBridge()
+    (c.width, c.height) = (1250, 750)
+    c.initGameConstants()
+    journal = c.scoreJournal
+    handlerCount = len(atexit._exithandlers)
+
+    #going back to the menu keeps the same journal (and doesn't register 
+    #another close for it)
+    c.initGameConstants()
+    assert(c.scoreJournal is journal)
+    assert(len(atexit._exithandlers) == handlerCount)
+    print "...passed!"
+
+def testStepProfiler():
+    print "Testing StepProfiler...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(0, 0), 10, environ, True), 
+             Node(Vector(1, 0), 10, environ, False),
+             Node(Vector(2, 0), 10, environ, True)]
+    BridgeBed(nodes[0], nodes[1], 0.5, environ)
+    BridgeBed(nodes[1], nodes[2], 0.5, environ)
+    Weight(Vector(1, 0.5), 10, environ)
+    environ.start()
+    assert(environ.profiler == None)
+
+    #only the last few steps are kept
+    profiler = environ.startProfiling(3)
+    for i in xrange(5):
+        environ.update(1/30.0, 1000, 1000)
+    records = profiler.getRecords()
+    assert([record["step"] for record in records] == [2, 3, 4])
+    for phase in ["broadphase", "collisions", "constraints", "islands", 
+                  "integrate", "offScreen", "breaks"]:
+        assert(phase in records[0]["phases"])
+        assert(phase in profiler.getAverages())
+    assert(records[0]["pairs"] > 0 and records[0]["constraints"] == 2)
+    assert(records[-1]["iterations"] == environ.lastIterations)
+
+    #vectors that are made and thrown away in a step are counted
+    profiler.startStep(environ)
+    for i in xrange(1000):
+        Vector(i, i) + Vector(1, 1)
+    profiler.endStep(environ)
+    assert(profiler.getRecords()[-1]["objectsCreated"] == 3000)
+
+    #the constructors only count while something is profiling
+    environ.stopProfiling()
+    environ.update(1/30.0, 1000, 1000)
+    assert(len(profiler.getRecords()) == 3)
+    count = getCreatedCount()
+    Vector(1, 1)
+    Weight(Vector(1, 2), 10, environ)
+    assert(getCreatedCount() == count)
+    assert(Vector(1, 2) + Vector(2, 3) == Vector(3, 5))
+    print "...passed!"
+
+def getObjectStates(environ):
+    states = []
+    for obj in environ.objects:
+        if(isinstance(obj, Constraint)):
+            position = (obj.nodes[0].position + obj.nodes[1].position) / 2
+        else:
+            position = obj.position
+        states.append((type(obj).__name__, position.getXY(), obj.color))
+    return sorted(states)
+
+def testSnapshot():
+    print "Testing Snapshot...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(0, 0), 10, environ, True), 
+             Node(Vector(1, 0), 10, environ, False, False, "brown"),
+             Node(Vector(2, 0), 10, environ, True)]
+    BridgeBed(nodes[0], nodes[1], 0.05, environ)
+    BridgeBeam(nodes[1], nodes[2], 0.05, environ)
+    snapshot = environ.getSnapshot()
+    buildStates = getObjectStates(environ)
+
+    #simulate until the bed breaks, then go back
+    environ.start()
+    Weight(Vector(0.5, 0.5), 1000, environ)
+    for i in xrange(100):
+        environ.update(1/30.0, 1000, 1000)
+    assert(getObjectStates(environ) != buildStates)
+    environ.restoreSnapshot(snapshot)
+    assert(getObjectStates(environ) == buildStates)
+    assert(not environ.isSimulating)
+    assert(len(environ.constraintIndexes) == 2)
+    node = environ.objects[environ.otherIndexes[1]]
+    assert(not node.visible and node.color == "brown")
+
+    #a snapshot from the middle of a simulation continues the same way
+    environ.start()
+    Weight(Vector(0.5, 0.5), 1000, environ)
+    for i in xrange(5):
+        environ.update(1/30.0, 1000, 1000)
+    snapshot = environ.getSnapshot()
+    otherEnviron = PhysEnvironment(10, 100, 0, 250)
+    otherEnviron.restoreSnapshot(snapshot)
+    for i in xrange(20):
+        environ.update(1/30.0, 1000, 1000)
+        otherEnviron.update(1/30.0, 1000, 1000)
+    assert(getObjectStates(environ) == getObjectStates(otherEnviron))
+    print "...passed!"
+
+def testCheckpoints():
+    print "Testing checkpoints...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(0, 0), 10, environ, True), 
+             Node(Vector(1, 0), 10, environ, False),
+             Node(Vector(2, 0), 10, environ, False),
+             Node(Vector(3, 0), 10, environ, True)]
+    for i in xrange(3):
+        BridgeBed(nodes[i], nodes[i+1], 0.05, environ)
+    environ.start()
+    checkpoints = environ.startCheckpoints(10, 3)
+
+    #a load that grows with the step number
+    def addLoad(environ, step):
+        for index in environ.otherIndexes:
+            environ.objects[index].addForce(Vector(0, -step))
+
+    for step in xrange(45):
+        addLoad(environ, step)
+        environ.update(1/30.0, 1000, 1000)
+    states = getObjectStates(environ)
+    #only the newest few checkpoints are kept
+    assert(checkpoints.getSteps() == [20, 30, 40])
+
+    #going back and simulating forward gets to the same place
+    environ.replayTo(45, 1/30.0, 1000, 1000, addLoad)
+    assert(environ.stepCount == 45)
+    assert(getObjectStates(environ) == states)
+    assert(environ.restoreCheckpoint(25) == 20)
+    assert(checkpoints.getSteps() == [20])
+    environ.replayTo(45, 1/30.0, 1000, 1000, addLoad)
+    assert(getObjectStates(environ) == states)
+    assert(checkpoints.getSteps() == [20, 30, 40])
+
+    #with the grid broadphase too, after weights were added and deleted 
+    #(the restored objects are in a different order than they were made)
+    environ = PhysEnvironment(10, 50, 0, 750, "grid")
+    nodes = [Node(Vector(x, y), 10, environ, True) 
+             for (x, y) in [(2, 12), (3, 3), (9, 3), (10, 12)]]
+    for i in xrange(3):
+        LandBeam(nodes[i], nodes[i+1], 0.05, environ)
+    environ.start()
+    environ.startCheckpoints(30, 10)
+
+    def dropWeights(environ, step):
+        if(step % 4 == 0):
+            x = random.Random(step).uniform(3.5, 8.5)
+            Weight(Vector(x, 11), 10, environ)
+        if(step % 50 == 25):
+            environ.objects[environ.weightIndexes[1]].delete()
+
+    for step in xrange(150):
+        dropWeights(environ, step)
+        environ.update(1/30.0, 600, 750)
+    states = getObjectStates(environ)
+    environ.restoreCheckpoint(60)
+    environ.replayTo(150, 1/30.0, 600, 750, dropWeights)
+    assert(getObjectStates(environ) == states)
+    print "...passed!"
+
+#stands in for a Tkinter canvas, keeping the items and counting the calls
+class RecordingCanvas(object):
+    def __init__(self):
+        self.items = dict()
+        self.nextItem = 1
+        self.calls = dict()
+        #tags raised, in order
+        self.raised = []
+
+    def record(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def create(self, *coords, **options):
+        self.record("create")
+        item = self.nextItem
+        self.nextItem += 1
+        if(options.get("tags") != "debug"):
+            self.items[item] = (coords, options["fill"])
+        return item
+
+    create_oval = create_line = create_text = create
+
+    def coords(self, item, *coords):
+        self.record("coords")
+        self.items[item] = (coords, self.items[item][1])
+
+    def itemconfig(self, item, fill):
+        self.record("itemconfig")
+        self.items[item] = (self.items[item][0], fill)
+
+    def delete(self, item):
+        self.record("delete")
+        if(item == "physics"):
+            self.items = dict()
+        else:
+            del self.items[item]
+
+    def tag_raise(self, tag):
+        self.record("tag_raise")
+        self.raised.append(tag)
+
+def testRetainedDrawing():
+    print "Testing retained drawing...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    canvas = RecordingCanvas()
+    nodes = [Node(Vector(0, 0), 10, environ, True),
+             Node(Vector(1, 0), 10, environ, False),
+             Node(Vector(2, 0), 10, environ, True)]
+    BridgeBed(nodes[0], nodes[1], 0.05, environ)
+    BridgeBed(nodes[1], nodes[2], 0.05, environ)
+    environ.draw(canvas)
+    assert(len(canvas.items) == 5 and canvas.calls["create"] == 5)
+
+    #nothing changed, so nothing on the canvas changes
+    canvas.calls = dict()
+    environ.draw(canvas)
+    assert(canvas.calls == dict())
+
+    #only the moved node and its constraints are updated
+    nodes[1].position = Vector(1, 0.5)
+    environ.draw(canvas)
+    assert(canvas.calls == {"coords": 3})
+    canvas.calls = dict()
+    nodes[1].color = "red"
+    environ.draw(canvas)
+    assert(canvas.calls == {"itemconfig": 1})
+    assert(canvas.items[nodes[1].canvasItem][1] == "red")
+
+    #deleted objects take their items with them
+    canvas.calls = dict()
+    nodes[2].delete()
+    environ.draw(canvas)
+    assert(canvas.calls == {"delete": 2})
+    assert(len(canvas.items) == 3)
+    Weight(Vector(1, 1), 10, environ)
+    environ.draw(canvas)
+    assert(len(canvas.items) == 4)
+
+    #a restored snapshot replaces every item
+    snapshot = environ.getSnapshot()
+    environ.restoreSnapshot(snapshot)
+    environ.draw(canvas)
+    assert(len(canvas.items) == 4)
+    environ.clearDrawing(canvas)
+    assert(len(canvas.items) == 0)
+    environ.draw(canvas)
+    assert(len(canvas.items) == 4)
+
+    #the debug text ends up in front of the nodes
+    environ.clearDrawing(canvas)
+    canvas.raised = []
+    environ.draw(canvas, True)
+    assert(canvas.raised == ["constraint", "node", "debug"])
+    print "...passed!"
+
+#the color BridgeBeam.updateColor used to work out on every draw
+def getBeamColor(displaceRatio):
+    (red, green, blue) = (180, 180, 180)
+    displaceRatio = min(max(displaceRatio, -1), 1)
+    if(displaceRatio < 0):
+        (red, green, blue) = (180 - abs(displaceRatio) * 180, 
+                              180 - abs(displaceRatio) * 180,
+                              180 + abs(displaceRatio) * 75)
+    else:
+        (red, green, blue) = (180 + displaceRatio * 75, 
+                              180 - displaceRatio * 180,
+                              180 - displaceRatio * 180)
+    return (red, green, blue)
+
+def testStressColors():
+    print "Testing stress colors...",
+    environ = PhysEnvironment(10, 100, 0, 250)
+    nodes = [Node(Vector(i, 0), 10, environ, True) for i in xrange(4)]
+    beams = [BridgeBeam(nodes[i], nodes[i+1], 0.05, environ) 
+             for i in xrange(3)]
+    land = LandBeam(nodes[0], nodes[3], 0.05, environ)
+    assert(BridgeBeam.getStressColor(0) == beams[0].baseColor)
+    assert(len(BridgeBed.colorTable) == 2 * Constraint.colorSteps + 1)
+
+    #the table colors are within a step of the exact ones
+    for ratio in [-2, -1, -0.53, -0.011, 0, 0.2, 0.777, 1, 3]:
+        beams[0].lenRatio = ratio * beams[0].breakRatio
+        environ.updateColors()
+        color = beams[0].color
+        channels = [int(color[i:i+2], 16) for i in xrange(1, 7, 2)]
+        exact = getBeamColor(ratio)
+        for i in xrange(3):
+            assert(abs(channels[i] - exact[i]) <= 180.0 / 50 / 2 + 1)
+
+    #only constraints whose step changed are recolored
+    beams[1].color = "red"
+    beams[1].lenRatio += 0.0001 * beams[1].breakRatio
+    environ.updateColors()
+    assert(beams[1].color == "red")
+    beams[1].lenRatio = 0.5 * beams[1].breakRatio
+    environ.updateColors()
+    assert(beams[1].color == BridgeBeam.getStressColor(0.5))
+    assert(land.color == "green" and land.colorBucket == None)
+    print "...passed!"
+
+def testLevelFile():
+    print "Testing levelFile...",
+    path = "levels" + os.sep + "level_Level 1.txt"
+    (nodes, constraints, startNodes, highScore) = levelFile.getLevelInfo(path)
+    assert(nodes[0] == (8.7, 8.22))
+    assert(constraints[0] == (0, 1))
+    assert(startNodes == [0, 2, 4, 6])
+    assert(levelFile.getLevelName(path) == "Level 1")
+    assert(levelFile.textToList("[]") == [])
+
+    #bridges are saved and loaded like levels
+    bridge = ([(11.35, 8.2), (14.0, 8.2)], [(0, 4), (4, 5), (5, 1)], [])
+    (handle, bridgePath) = tempfile.mkstemp()
+    os.close(handle)
+    levelFile.saveBridgeInfo(bridgePath, bridge)
+    assert(levelFile.getBridgeInfo(bridgePath) == bridge)
+    os.remove(bridgePath)
+    print "...passed!"
+
+def testLevelCache():
+    print "Testing the level cache...",
+    folder = tempfile.mkdtemp()
+    path = folder + os.sep + "level_test.txt"
+    levelFile.writeFile(path, "[(1.5, 2.0), (3, 4)]\n[(0, 1)]\n[1]\n250")
+    info = levelFile.getLevelInfo(path)
+    assert(info == levelFile.parseLevel(path))
+    assert(os.path.exists(levelFile.getCompiledPath(path)))
+
+    #the compiled copy gives the same info without parsing the text
+    levelFile.levelCache.clear()
+    assert(levelFile.getLevelInfo(path) == info)
+    assert(levelFile.getLevelInfo(path) is levelFile.getLevelInfo(path))
+
+    #changing the text file throws out both copies
+    levelFile.writeFile(path, "[(1.5, 2.0), (3, 4)]\n[(0, 1)]\n[1]\n1000")
+    assert(levelFile.getLevelInfo(path)[3] == "1000")
+    levelFile.levelCache.clear()
+    assert(levelFile.getLevelInfo(path)[3] == "1000")
+
+    shutil.rmtree(folder)
+    print "...passed!"
+
+def testLevelCatalog():
+    print "Testing the level catalog...",
+    folder = tempfile.mkdtemp()
+    path = folder + os.sep + "level_a.txt"
+    levelFile.writeFile(path, "[(1.5, 2.0), (3, 4)]\n[(0, 1)]\n[1]\n250")
+    levels = levelFile.getCatalog(folder)
+    assert(len(levels) == 1 and levels[0]["name"] == "a")
+    assert(levels[0]["nodes"] == 2 and levels[0]["highScore"] == 250)
+
+    #new files are found, and changed files are updated when told
+    otherPath = folder + os.sep + "level_b.txt"
+    levelFile.writeFile(otherPath, "[(1, 2), (3, 4)]\n[]\n[0, 1]\n0")
+    os.utime(folder, (0, 0))
+    levelFile.writeFile(path, "[(1.5, 2.0), (3, 4)]\n[(0, 1)]\n[1]\n500")
+    levelFile.updateCatalog(path)
+    levels = levelFile.getCatalog(folder)
+    assert([level["name"] for level in levels] == ["a", "b"])
+    assert(levels[0]["highScore"] == 500 and levels[1]["constraints"] == 0)
+
+    #a file changed without telling the catalog is still found, even if 
+    #the folder's mtime didn't change
+    folderStat = os.stat(folder)
+    levelFile.writeFile(otherPath, "[(1, 2), (3, 4)]\n[(0, 1)]\n[0, 1]\n0")
+    os.utime(folder, (folderStat.st_atime, folderStat.st_mtime))
+    levels = levelFile.getCatalog(folder)
+    assert(levels[1]["constraints"] == 1)
+
+    #the catalog is saved, so it doesn't have to be made again
+    levelFile.catalogs.clear()
+    assert(levelFile.getCatalog(folder) == levels)
+    shutil.rmtree(folder)
+    print "...passed!"
+
+def testScoreJournal():
+    print "Testing ScoreJournal...",
+    folder = tempfile.mkdtemp()
+    path = folder + os.sep + "scores.journal"
+    journal = ScoreJournal(path, 4)
+    assert(journal.getHighScore("a") == 0)
+    assert(journal.record("a", 250))
+    assert(not journal.record("a", 250))
+    assert(journal.record("b", 500))
+    assert(journal.record("a", 750))
+    assert(journal.getHighScore("a") == 750)
+    journal.flush()
+    assert(len(levelFile.readFile(path).splitlines()) == 3)
+
+    #going over maxLines compacts it to one line per level
+    journal.record("c", 100)
+    journal.record("c", 200)
+    journal.close()
+    lines = levelFile.readFile(path).splitlines()
+    assert(lines == ["a\t750", "b\t500", "c\t200"])
+
+    #a new journal finds the old scores (and skips a half written line)
+    levelFile.writeFile(path, "d\t10", "at")
+    journal = ScoreJournal(path)
+    assert(journal.getHighScore("a") == 750)
+    assert(journal.getHighScore("c") == 200)
+    assert(journal.getHighScore("d") == 0)
+    journal.record("d", 20)
+    journal.close()
+    assert(levelFile.readFile(path).splitlines()[-1] == "d\t20")
+    shutil.rmtree(folder)
+    print "...passed!"
+
+def testSimulation():
+    print "Testing Simulation...",
+    path = "levels" + os.sep + "level_Level 1.txt"
+    #a bridge with nothing in the middle doesn't span
+    simulation = Simulation(path, ([], [], []))
+    assert(not simulation.spansGap())
+
+    bridge = ([(11.35, 8.2), (14.0, 8.2), (12.7, 6.6)], 
+              [(0, 4), (4, 5), (5, 1)], 
+              [(2, 4), (4, 6), (6, 5), (5, 3), (2, 6), (6, 3)])
+    simulation = Simulation(path, bridge)
+    assert(simulation.spansGap())
+    assert(len(simulation.bedNodes) == 2)
+    results = simulation.run()
+    assert(results["broke"])
+    assert(results["score"] == simulation.loadIncrement * 
+                               (results["breakStep"] / 30))
+    assert(results["peakRatio"] > simulation.breakRatio)
+
+    #the same bridge gives the same results every time
+    assert(Simulation(path, bridge).run() == results)
+    print "...passed!"
+
+def testEvaluateDesigns():
+    print "Testing evaluateDesigns...",
+    path = "levels" + os.sep + "level_Level 1.txt"
+    bridge = ([(11.35, 8.2), (14.0, 8.2), (12.7, 6.6)], 
+              [(0, 4), (4, 5), (5, 1)], 
+              [(2, 4), (4, 6), (6, 5), (5, 3), (2, 6), (6, 3)])
+    bridges = [bridge, ([], [], []), bridge]
+
+    #the worker processes give the same results as running in this one
+    results = evaluateDesigns(path, bridges, 2)
+    assert(results == evaluateDesigns(path, bridges, 1))
+    assert(results[0]["spans"] and results[0]["broke"])
+    assert(not results[1]["spans"] and results[1]["steps"] == 0)
+    assert(results[2] == results[0])
+    print "...passed!"
+
 
-testVectorClass()
-testPhysEnvironmentClass()
-testTextToList()
\ No newline at end of file
+#(guarded so worker processes started by the tests can import this file)
+if(__name__ == "__main__"):
+    testVectorClass()
+    testPhysEnvironmentClass()
+    testParticleStore()
+    testIntegrate()
+    testConstraintSolver()
+    testSequentialResolve()
+    testSweepAndPrune()
+    testSpatialHash()
+    testDeleteObj()
+    testNodeGrid()
+    testDoesBridgeCover()
+    testFixCollisionPairs()
+    testIslands()
+    testGetDrawPosition()
+    testScreenCoords()
+    testAdaptiveIterations()
+    testStepProfiler()
+    testSnapshot()
+    testCheckpoints()
+    testRetainedDrawing()
+    testStressColors()
+    testLevelFile()
+    testLevelCache()
+    testLevelCatalog()
+    testScoreJournal()
+    testSimulation()
+    testEvaluateDesigns()
+    testTextToList()
+    testCoalescedDrags()
+    testTestModeCheckpoints()
+    testPausedFrames()
+    testGameConstants()